@@ -127,6 +127,10 @@ def create_app(config_name='default'):
     if app.config.get('GHOSTSTREAM_ENABLED', False):
         logger.info("GhostStream integration enabled")
 
+    # Prune per-session media ordering state in the background
+    from .services.media_service import MediaService
+    MediaService.start_session_cleanup(app)
+
     # Global middleware for session management
     @app.after_request
     def ensure_session_cookie(response):
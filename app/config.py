@@ -41,6 +41,7 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', os.urandom(24))  # Session security
     CATEGORIES_FILE = os.environ.get('CATEGORIES_FILE', 'media_categories.json')
     SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', 'auto') == 'true' # Stays as env-var/default only
+    STATX_DONT_SYNC = os.environ.get('STATX_DONT_SYNC', 'false') == 'true' # Linux: index network mounts from the attribute cache (env-var only)
 
     # Default values for settings that can be overridden by JSON and then ENV VARS
     CACHE_EXPIRY = 300  # 5 minutes
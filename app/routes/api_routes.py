@@ -25,6 +25,19 @@ if os.getenv("DOCKER_ENV") != "true":
 logger = logging.getLogger(__name__)
 api_bp = Blueprint('api', __name__)
 
+# Optional dependencies
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+def _json_response(data):
+    """Like jsonify(data), but encoded with orjson when it is installed."""
+    if HAS_ORJSON:
+        return current_app.response_class(orjson.dumps(data), mimetype='application/json')
+    return jsonify(data)
+
 # --- Configuration Management Endpoints ---
 
 @api_bp.route('/config', methods=['GET'])
@@ -235,7 +248,8 @@ def list_media(category_id):
                 response_data['last_known_index'] = last_known_index
                 logger.info(f"Including last_known_index: {last_known_index} for category {category_id}")
 
-        return jsonify(response_data)
+        # Media pages are the largest, most frequent API payload
+        return _json_response(response_data)
     except Exception as e:
         logger.error(f"Error listing media for category {category_id}: {str(e)}")
         logger.debug(traceback.format_exc())
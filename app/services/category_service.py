@@ -74,6 +74,13 @@ class CategoryService:
         categories = load_categories()
         return next((c for c in categories if c.get('id') == category_id), None)
 
+    @staticmethod
+    def _clear_category_cache():
+        """Drop the media service's memoized category lookups after a change."""
+        # Imported here because media_service imports this module
+        from app.services.media_service import clear_category_cache
+        clear_category_cache()
+
     @staticmethod
     def add_category(name, path):
         """
@@ -113,6 +120,7 @@ class CategoryService:
         categories.append(new_category)
 
         if save_categories(categories):
+            CategoryService._clear_category_cache()
             logger.info(f"Successfully added category: ID={new_category['id']}, Name='{name}'")
             return new_category, None
         else:
@@ -135,9 +143,8 @@ class CategoryService:
             logger.warning(f"Category with ID {category_id} not found for deletion.")
             return False, "Category not found"
 
-        # Optionally clear related cache entries here if caching is implemented at this level
-
         if save_categories(categories):
+            CategoryService._clear_category_cache()
             logger.info(f"Successfully deleted category with ID: {category_id}")
             return True, None
         else:
@@ -6,6 +6,7 @@ Provides synchronous API suitable for Flask integration.
 """
 
 import logging
+import socket
 import threading
 import time
 import urllib.request
@@ -17,21 +18,43 @@ from enum import Enum
 
 logger = logging.getLogger(__name__)
 
-# Optional dependencies
-try:
-    import httpx
-    HAS_HTTPX = True
-except ImportError:
-    HAS_HTTPX = False
-    logger.warning("httpx not installed - GhostStream integration disabled")
+# Optional dependencies, imported on first use so that installs with
+# GhostStream disabled never load them
+httpx = None
+_HAS_HTTPX = None
 
-try:
-    from zeroconf import ServiceBrowser, ServiceListener, Zeroconf
-    import socket
-    HAS_ZEROCONF = True
-except ImportError:
-    HAS_ZEROCONF = False
-    logger.info("zeroconf not installed - mDNS discovery disabled")
+ServiceBrowser = None
+Zeroconf = None
+_HAS_ZEROCONF = None
+
+
+def _has_httpx() -> bool:
+    """Import httpx on first call and report whether it is available."""
+    global httpx, _HAS_HTTPX
+    if _HAS_HTTPX is None:
+        try:
+            import httpx as httpx_module
+            httpx = httpx_module
+            _HAS_HTTPX = True
+        except ImportError:
+            _HAS_HTTPX = False
+            logger.warning("httpx not installed - GhostStream integration disabled")
+    return _HAS_HTTPX
+
+
+def _has_zeroconf() -> bool:
+    """Import zeroconf on first call and report whether it is available."""
+    global ServiceBrowser, Zeroconf, _HAS_ZEROCONF
+    if _HAS_ZEROCONF is None:
+        try:
+            from zeroconf import ServiceBrowser as service_browser, Zeroconf as zeroconf_cls
+            ServiceBrowser = service_browser
+            Zeroconf = zeroconf_cls
+            _HAS_ZEROCONF = True
+        except ImportError:
+            _HAS_ZEROCONF = False
+            logger.info("zeroconf not installed - mDNS discovery disabled")
+    return _HAS_ZEROCONF
 
 
 class TranscodeStatus(str, Enum):
@@ -43,6 +66,20 @@ class TranscodeStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
+# Raw status string -> enum member, avoids Enum value lookup on every poll
+_STATUS_MAP = {status.value: status for status in TranscodeStatus}
+
+# Raw statuses after which wait_for_ready stops polling
+_TERMINAL_STATUSES = frozenset((
+    TranscodeStatus.READY.value,
+    TranscodeStatus.ERROR.value,
+    TranscodeStatus.CANCELLED.value,
+))
+
+# How long the first lookups after deferred discovery starts wait for a server to be announced
+DISCOVERY_WAIT_SECONDS = 3.0
+
+
 @dataclass
 class GhostStreamServer:
     """Represents a discovered GhostStream server."""
@@ -144,10 +181,16 @@ class GhostStreamService:
         
         self.servers: Dict[str, GhostStreamServer] = {}
         self.preferred_server: Optional[str] = None
-        self.active_jobs: Dict[str, str] = {}  # job_id -> server_name
+        self._servers_lock = threading.RLock()  # guards servers/preferred_server/active_jobs (mDNS thread vs requests)
+        self.active_jobs: Dict[str, Optional[GhostStreamServer]] = {}  # job_id -> server
+        self._job_ids: List[str] = []  # active job ids in insertion order
         self._zeroconf = None
         self._browser = None
         self._discovery_started = False
+        self._discovery_pending = False
+        self._discovery_lock = threading.RLock()  # guards starting/stopping discovery
+        self._discovery_deadline = 0.0
+        self._server_found = threading.Event()
         self._enabled = False
         self._manual_server = None
         self._initialized = True
@@ -164,12 +207,13 @@ class GhostStreamService:
         
         self._enabled = enabled
         self._manual_server = server_url
+        self._discovery_pending = False
         
         if not enabled:
             logger.info("GhostStream is disabled")
             return
         
-        if not HAS_HTTPX:
+        if not _has_httpx():
             logger.error("GhostStream enabled but httpx not installed! Run: pip install httpx")
             return
         
@@ -195,107 +239,173 @@ class GhostStreamService:
                     host = server_url
                     port = 8765  # Default GhostStream port
                 
-                self.servers["manual"] = GhostStreamServer(
-                    name="manual",
-                    host=host,
-                    port=port
-                )
-                self.preferred_server = "manual"
+                with self._servers_lock:
+                    self.servers["manual"] = GhostStreamServer(
+                        name="manual",
+                        host=host,
+                        port=port
+                    )
+                    self.preferred_server = "manual"
                 logger.info(f"GhostStream configured with server: {host}:{port}")
                 
-                # Test connection immediately
-                if self.health_check():
-                    logger.info(f"GhostStream server {host}:{port} is reachable!")
-                else:
-                    logger.warning(f"GhostStream server {host}:{port} configured but not reachable yet")
+                # Test connection in the background so configure() never blocks on it
+                def report_reachability():
+                    if self.health_check():
+                        logger.info(f"GhostStream server {host}:{port} is reachable!")
+                    else:
+                        logger.warning(f"GhostStream server {host}:{port} configured but not reachable yet")
+                
+                threading.Thread(target=report_reachability, daemon=True).start()
                     
             except ValueError as e:
                 logger.error(f"Invalid GhostStream server URL '{server_url}': {e}")
-        elif HAS_ZEROCONF:
-            # Start mDNS discovery
-            logger.info("No server URL, starting mDNS discovery...")
-            self.start_discovery()
+        elif _has_zeroconf():
+            # Defer mDNS discovery until a server is actually needed
+            logger.info("No server URL, mDNS discovery will start on first use")
+            self._discovery_pending = True
         else:
             logger.warning("GhostStream enabled but no server URL and zeroconf not available")
     
     def start_discovery(self) -> bool:
         """Start mDNS discovery for GhostStream servers."""
-        if not HAS_ZEROCONF:
+        if not _has_zeroconf():
             logger.warning("zeroconf not available for mDNS discovery")
             return False
         
-        if self._discovery_started:
-            return True
-        
-        try:
-            self._zeroconf = Zeroconf()
-            listener = GhostStreamDiscoveryListener(
-                on_found=self._on_server_found,
-                on_removed=self._on_server_removed
-            )
-            self._browser = ServiceBrowser(
-                self._zeroconf,
-                GhostStreamDiscoveryListener.SERVICE_TYPE,
-                listener
-            )
-            self._discovery_started = True
-            logger.info("Started GhostStream mDNS discovery")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to start GhostStream discovery: {e}")
-            return False
+        # Concurrent first callers must not each build a Zeroconf instance and browser
+        with self._discovery_lock:
+            if self._discovery_started:
+                return True
+            
+            try:
+                self._zeroconf = Zeroconf()
+                listener = GhostStreamDiscoveryListener(
+                    on_found=self._on_server_found,
+                    on_removed=self._on_server_removed
+                )
+                self._browser = ServiceBrowser(
+                    self._zeroconf,
+                    GhostStreamDiscoveryListener.SERVICE_TYPE,
+                    listener
+                )
+                self._discovery_deadline = time.monotonic() + DISCOVERY_WAIT_SECONDS
+                self._discovery_started = True
+                logger.info("Started GhostStream mDNS discovery")
+                return True
+            except Exception as e:
+                logger.error(f"Failed to start GhostStream discovery: {e}")
+                return False
     
     def stop_discovery(self):
         """Stop mDNS discovery."""
-        if self._browser:
-            self._browser.cancel()
-        if self._zeroconf:
-            self._zeroconf.close()
-        self._browser = None
-        self._zeroconf = None
-        self._discovery_started = False
+        with self._discovery_lock:
+            if self._browser:
+                self._browser.cancel()
+            if self._zeroconf:
+                self._zeroconf.close()
+            self._browser = None
+            self._zeroconf = None
+            self._discovery_started = False
     
     def _on_server_found(self, server: GhostStreamServer):
         """Called when a server is discovered."""
-        self.servers[server.name] = server
+        with self._servers_lock:
+            self.servers[server.name] = server
+            
+            # Auto-select first server with hw accel, or first found
+            if self.preferred_server is None:
+                self.preferred_server = server.name
+            else:
+                current = self.servers.get(self.preferred_server)
+                if server.has_hw_accel and current and not current.has_hw_accel:
+                    self.preferred_server = server.name
         
-        # Auto-select first server with hw accel, or first found
-        if self.preferred_server is None:
-            self.preferred_server = server.name
-        elif server.has_hw_accel and self.get_server() and not self.get_server().has_hw_accel:
-            self.preferred_server = server.name
+        # Wake lookups waiting on the first discovery
+        self._server_found.set()
     
     def _on_server_removed(self, name: str):
         """Called when a server is removed."""
-        self.servers.pop(name, None)
+        with self._servers_lock:
+            removed = self.servers.pop(name, None)
+            
+            if self.preferred_server == name:
+                self.preferred_server = next(iter(self.servers.keys()), None)
         
-        if self.preferred_server == name:
-            self.preferred_server = next(iter(self.servers.keys()), None)
+            # Drop references so jobs on the removed server fall back to the preferred one
+            if removed is not None:
+                for job_id, job_server in list(self.active_jobs.items()):
+                    if job_server is removed:
+                        self.active_jobs[job_id] = None
     
     def is_enabled(self) -> bool:
         """Check if GhostStream is enabled."""
-        return self._enabled and HAS_HTTPX
-    
-    def is_available(self) -> bool:
-        """Check if any GhostStream server is available."""
-        return self.is_enabled() and len(self.servers) > 0
-    
-    def get_server(self, name: Optional[str] = None) -> Optional[GhostStreamServer]:
-        """Get a server by name, or the preferred server."""
-        if name:
-            return self.servers.get(name)
-        if self.preferred_server:
-            return self.servers.get(self.preferred_server)
+        return self._enabled and _has_httpx()
+    
+    def _start_pending_discovery(self):
+        """
+        Start deferred mDNS discovery the first time a server is needed.
+        
+        Discovery runs in the background, so lookups made within
+        DISCOVERY_WAIT_SECONDS of it starting block until the first server
+        is announced or that time runs out, instead of reporting none.
+        """
+        if self._discovery_pending:
+            # Callers racing the first one wait here until the deadline is set
+            with self._discovery_lock:
+                if self._discovery_pending and not self._discovery_started:
+                    self.start_discovery()
+                self._discovery_pending = False
+        
+        remaining = self._discovery_deadline - time.monotonic()
+        if remaining > 0:
+            self._server_found.wait(remaining)
+    
+    def is_available(self, trigger_discovery: bool = True) -> bool:
+        """
+        Check if any GhostStream server is available.
+        
+        With trigger_discovery, a call made while deferred discovery is just
+        starting may block for up to DISCOVERY_WAIT_SECONDS when no server
+        has been found yet; pass False to never wait.
+        """
+        if not self.is_enabled():
+            return False
+        if not self.servers and trigger_discovery:
+            self._start_pending_discovery()
+        return len(self.servers) > 0
+    
+    def get_server(
+        self,
+        name: Optional[str] = None,
+        trigger_discovery: bool = True
+    ) -> Optional[GhostStreamServer]:
+        """
+        Get a server by name, or the preferred server.
+        
+        With trigger_discovery, a call made while deferred discovery is just
+        starting may block for up to DISCOVERY_WAIT_SECONDS when no server
+        has been found yet; pass False to never wait.
+        """
+        if not self.servers and trigger_discovery:
+            self._start_pending_discovery()
+        with self._servers_lock:
+            if name:
+                return self.servers.get(name)
+            if self.preferred_server:
+                return self.servers.get(self.preferred_server)
         return None
     
     def get_all_servers(self) -> List[GhostStreamServer]:
         """Get all discovered servers."""
-        return list(self.servers.values())
+        with self._servers_lock:
+            return list(self.servers.values())
     
     def get_active_jobs_for_category(self, category_id: str) -> List[Dict]:
         """Get all active jobs that match a category (by checking source URL)."""
         jobs = []
-        for job_id in list(self.active_jobs.keys()):
+        with self._servers_lock:
+            job_ids = list(self._job_ids)
+        for job_id in job_ids:
             job = self.get_job_status(job_id)
             if job and category_id in str(job_id):  # Simple check
                 jobs.append({
@@ -306,57 +416,53 @@ class GhostStreamService:
                 })
         return jobs
     
-    def health_check(self, server: Optional[GhostStreamServer] = None) -> bool:
-        """Check if a server is healthy."""
-        if not HAS_HTTPX:
-            logger.debug("health_check: httpx not available")
-            return False
-        
-        server = server or self.get_server()
-        if not server:
-            logger.debug("health_check: no server configured")
-            return False
+    def _request(
+        self,
+        method: str,
+        path: str,
+        server: Optional[GhostStreamServer] = None,
+        timeout: float = 10.0,
+        expect_json: bool = False
+    ) -> Any:
+        """
+        Send a request to a GhostStream server.
         
-        try:
-            url = f"{server.base_url}/api/health"
-            logger.debug(f"health_check: checking {url}")
-            with httpx.Client(timeout=5.0) as client:
-                response = client.get(url)
-                if response.status_code == 200:
-                    logger.debug(f"health_check: {url} returned 200 OK")
-                    return True
-                else:
-                    logger.warning(f"health_check: {url} returned {response.status_code}")
-                    return False
-        except httpx.ConnectError as e:
-            logger.warning(f"health_check: Connection failed to {server.base_url}: {e}")
-            return False
-        except httpx.TimeoutException as e:
-            logger.warning(f"health_check: Timeout connecting to {server.base_url}: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"health_check: Error checking {server.base_url}: {e}")
-            return False
-    
-    def get_capabilities(self, server: Optional[GhostStreamServer] = None) -> Optional[Dict]:
-        """Get server capabilities."""
-        if not HAS_HTTPX:
+        Returns the decoded JSON body (expect_json) or True on a 200 response,
+        None on any other response or error.
+        """
+        if not _has_httpx():
+            logger.debug(f"GhostStream {method} {path}: httpx not available")
             return None
         
         server = server or self.get_server()
         if not server:
+            logger.debug(f"GhostStream {method} {path}: no server configured")
             return None
         
+        url = f"{server.base_url}{path}"
         try:
-            with httpx.Client(timeout=10.0) as client:
-                response = client.get(f"{server.base_url}/api/capabilities")
+            with httpx.Client(timeout=timeout) as client:
+                response = client.request(method, url)
                 if response.status_code == 200:
-                    return response.json()
+                    return response.json() if expect_json else True
+                logger.warning(f"GhostStream {method} {url} returned {response.status_code}")
+        except httpx.ConnectError as e:
+            logger.warning(f"GhostStream {method} {url}: connection failed: {e}")
+        except httpx.TimeoutException as e:
+            logger.warning(f"GhostStream {method} {url}: timed out: {e}")
         except Exception as e:
-            logger.error(f"Failed to get GhostStream capabilities: {e}")
+            logger.error(f"GhostStream {method} {url} error: {e}")
         
         return None
     
+    def health_check(self, server: Optional[GhostStreamServer] = None) -> bool:
+        """Check if a server is healthy."""
+        return bool(self._request("GET", "/api/health", server, timeout=5.0))
+    
+    def get_capabilities(self, server: Optional[GhostStreamServer] = None) -> Optional[Dict]:
+        """Get server capabilities."""
+        return self._request("GET", "/api/capabilities", server, expect_json=True)
+    
     def start_transcode(
         self,
         source: str,
@@ -396,7 +502,7 @@ class GhostStreamService:
         Returns:
             TranscodeJob with stream_url for playback, or None on failure
         """
-        if not HAS_HTTPX:
+        if not _has_httpx():
             logger.error("httpx not available for GhostStream")
             return None
         
@@ -440,14 +546,14 @@ class GhostStreamService:
                 data = json_lib.loads(response.read().decode('utf-8'))
                 job = TranscodeJob(
                     job_id=data["job_id"],
-                    status=TranscodeStatus(data["status"]),
+                    status=_STATUS_MAP[data["status"]],
                     progress=data.get("progress", 0),
                     stream_url=data.get("stream_url"),
                     download_url=data.get("download_url"),
                     hw_accel_used=data.get("hw_accel_used"),
                     mode=mode
                 )
-                self.active_jobs[job.job_id] = server.name
+                self._track_job(job.job_id, server)
                 return job
         except urllib.error.HTTPError as e:
             logger.error(f"GhostStream transcode HTTP error: {e.code} - {e.reason}")
@@ -547,15 +653,50 @@ class GhostStreamService:
             server=server
         )
     
-    def get_job_status(self, job_id: str, server: Optional[GhostStreamServer] = None) -> Optional[TranscodeJob]:
-        """Get the status of a transcoding job."""
-        # Try the server we used to start this job
-        if job_id in self.active_jobs:
-            server_name = self.active_jobs[job_id]
-            if server_name in self.servers:
-                server = self.servers[server_name]
-        
-        server = server or self.get_server()
+    def _track_job(self, job_id: str, server: GhostStreamServer):
+        """Remember which server is running a job."""
+        with self._servers_lock:
+            if job_id not in self.active_jobs:
+                self._job_ids.append(job_id)
+            self.active_jobs[job_id] = server
+    
+    def _untrack_job(self, job_id: str):
+        """Forget a finished, cancelled or deleted job."""
+        with self._servers_lock:
+            if job_id in self.active_jobs:
+                del self.active_jobs[job_id]
+                self._job_ids.remove(job_id)
+    
+    def _resolve_job_server(
+        self,
+        job_id: str,
+        server: Optional[GhostStreamServer] = None
+    ) -> Optional[GhostStreamServer]:
+        """Get the server that started a job, falling back to the given or preferred server."""
+        with self._servers_lock:
+            job_server = self.active_jobs.get(job_id)
+        return job_server or server or self.get_server()
+    
+    @staticmethod
+    def _job_from_status(data: Dict) -> TranscodeJob:
+        """Build a TranscodeJob from a raw status response."""
+        return TranscodeJob(
+            job_id=data["job_id"],
+            status=_STATUS_MAP[data["status"]],
+            progress=data.get("progress", 0),
+            stream_url=data.get("stream_url"),
+            download_url=data.get("download_url"),
+            error_message=data.get("error_message"),
+            hw_accel_used=data.get("hw_accel_used"),
+            mode=data.get("mode", "stream"),
+            eta_seconds=data.get("eta_seconds"),
+            current_time=data.get("current_time"),
+            duration=data.get("duration")
+        )
+    
+    def _fetch_job_status(self, job_id: str, server: Optional[GhostStreamServer] = None) -> Optional[Dict]:
+        """Fetch the raw status response of a transcoding job."""
+        server = self._resolve_job_server(job_id, server)
         if not server:
             return None
         
@@ -565,20 +706,7 @@ class GhostStreamService:
             req.add_header('Accept', 'application/json')
             
             with urllib.request.urlopen(req, timeout=10) as response:
-                data = json_lib.loads(response.read().decode('utf-8'))
-                return TranscodeJob(
-                    job_id=data["job_id"],
-                    status=TranscodeStatus(data["status"]),
-                    progress=data.get("progress", 0),
-                    stream_url=data.get("stream_url"),
-                    download_url=data.get("download_url"),
-                    error_message=data.get("error_message"),
-                    hw_accel_used=data.get("hw_accel_used"),
-                    mode=data.get("mode", "stream"),
-                    eta_seconds=data.get("eta_seconds"),
-                    current_time=data.get("current_time"),
-                    duration=data.get("duration")
-                )
+                return json_lib.loads(response.read().decode('utf-8'))
         except urllib.error.HTTPError as e:
             if e.code != 404:  # Don't log 404s as errors
                 logger.error(f"GhostStream status HTTP error: {e.code}")
@@ -587,57 +715,34 @@ class GhostStreamService:
         
         return None
     
-    def cancel_job(self, job_id: str, server: Optional[GhostStreamServer] = None) -> bool:
-        """Cancel a transcoding job."""
-        if not HAS_HTTPX:
-            return False
-        
-        # Try the server we used to start this job
-        if job_id in self.active_jobs:
-            server_name = self.active_jobs[job_id]
-            if server_name in self.servers:
-                server = self.servers[server_name]
-        
-        server = server or self.get_server()
-        if not server:
-            return False
+    def get_job_status(self, job_id: str, server: Optional[GhostStreamServer] = None) -> Optional[TranscodeJob]:
+        """Get the status of a transcoding job."""
+        data = self._fetch_job_status(job_id, server)
+        if data is None:
+            return None
         
         try:
-            with httpx.Client(timeout=10.0) as client:
-                response = client.post(f"{server.base_url}/api/transcode/{job_id}/cancel")
-                if response.status_code == 200:
-                    self.active_jobs.pop(job_id, None)
-                    return True
+            return self._job_from_status(data)
         except Exception as e:
-            logger.error(f"GhostStream cancel error: {e}")
+            logger.error(f"GhostStream status error: {e}")
         
-        return False
+        return None
+    
+    def cancel_job(self, job_id: str, server: Optional[GhostStreamServer] = None) -> bool:
+        """Cancel a transcoding job."""
+        server = self._resolve_job_server(job_id, server)
+        if not self._request("POST", f"/api/transcode/{job_id}/cancel", server):
+            return False
+        self._untrack_job(job_id)
+        return True
     
     def delete_job(self, job_id: str, server: Optional[GhostStreamServer] = None) -> bool:
         """Delete a transcoding job and clean up temp files."""
-        if not HAS_HTTPX:
-            return False
-        
-        # Try the server we used to start this job
-        if job_id in self.active_jobs:
-            server_name = self.active_jobs[job_id]
-            if server_name in self.servers:
-                server = self.servers[server_name]
-        
-        server = server or self.get_server()
-        if not server:
+        server = self._resolve_job_server(job_id, server)
+        if not self._request("DELETE", f"/api/transcode/{job_id}", server):
             return False
-        
-        try:
-            with httpx.Client(timeout=10.0) as client:
-                response = client.delete(f"{server.base_url}/api/transcode/{job_id}")
-                if response.status_code == 200:
-                    self.active_jobs.pop(job_id, None)
-                    return True
-        except Exception as e:
-            logger.error(f"GhostStream delete error: {e}")
-        
-        return False
+        self._untrack_job(job_id)
+        return True
     
     def wait_for_ready(
         self,
@@ -654,23 +759,25 @@ class GhostStreamService:
         """
         elapsed = 0
         while elapsed < timeout:
-            job = self.get_job_status(job_id, server)
+            data = self._fetch_job_status(job_id, server)
             
-            if job is None:
+            if data is None:
                 return None
             
-            if job.status == TranscodeStatus.READY:
-                return job
-            
-            if job.status == TranscodeStatus.ERROR:
-                logger.error(f"GhostStream job failed: {job.error_message}")
-                return job
-            
-            if job.status == TranscodeStatus.CANCELLED:
-                return job
-            
-            # For streaming mode, return as soon as we have a stream URL
-            if job.stream_url and job.status == TranscodeStatus.PROCESSING:
+            # Compare raw strings so non-terminal polls never build a TranscodeJob
+            status = data.get("status")
+            if status in _TERMINAL_STATUSES or (
+                # For streaming mode, return as soon as we have a stream URL
+                status == TranscodeStatus.PROCESSING.value and data.get("stream_url")
+            ):
+                try:
+                    job = self._job_from_status(data)
+                except Exception as e:
+                    logger.error(f"GhostStream status error: {e}")
+                    return None
+                
+                if job.status == TranscodeStatus.ERROR:
+                    logger.error(f"GhostStream job failed: {job.error_message}")
                 return job
             
             time.sleep(poll_interval)
@@ -681,11 +788,14 @@ class GhostStreamService:
     
     def get_status_summary(self) -> Dict[str, Any]:
         """Get a summary of GhostStream status for the UI."""
-        server = self.get_server()
+        with self._servers_lock:
+            servers = list(self.servers.values())
+            preferred_server = self.preferred_server
+            active_job_count = len(self.active_jobs)
         return {
             "enabled": self._enabled,
-            "available": self.is_available(),
-            "server_count": len(self.servers),
+            "available": self.is_enabled() and len(servers) > 0,
+            "server_count": len(servers),
             "servers": [
                 {
                     "name": s.name,
@@ -693,12 +803,12 @@ class GhostStreamService:
                     "port": s.port,
                     "has_hw_accel": s.has_hw_accel,
                     "hw_accels": s.hw_accels,
-                    "is_preferred": s.name == self.preferred_server
+                    "is_preferred": s.name == preferred_server
                 }
-                for s in self.servers.values()
+                for s in servers
             ],
-            "active_jobs": len(self.active_jobs),
-            "preferred_server": self.preferred_server
+            "active_jobs": active_job_count,
+            "preferred_server": preferred_server
         }
 
 
@@ -5,28 +5,75 @@ Handles asynchronous indexing of media directories.
 """
 # app/services/indexing_service.py
 import os
+import stat
 import time
+import atexit
 import logging
 import traceback
 import threading
-from queue import Queue, Empty
+from collections import deque
+from queue import SimpleQueue
 from flask import current_app
-from app.utils.media_utils import is_media_file, process_category_thumbnails
-from app.utils.file_utils import load_index, save_index, is_large_directory
+from app.utils.media_utils import media_extensions, process_category_thumbnails
+from app.utils.system_utils import native_thread_pool
+from app.utils.file_utils import (
+    FileMetadataTable, load_index, save_index, is_large_directory, scan_directory,
+    get_directory_mtime, is_index_fresh, ensure_ghosthub_dir
+)
 
 logger = logging.getLogger(__name__)
 
 # Async indexing tracking: {category_id: {"status": "running|complete", "progress": 0-100, "files": [], "timestamp": time}}
-async_index_status = {}
+class _StatusMap(dict):
+    """
+    Dict of per-category indexing status with hash-sharded locks.
+    
+    Multi-field status updates and reader snapshots take only the lock of
+    their category's shard, so one category's progress never blocks another's.
+    """
+    SHARD_COUNT = 16
+    
+    def __init__(self):
+        super().__init__()
+        self._shard_locks = [threading.Lock() for _ in range(self.SHARD_COUNT)]
+    
+    def lock_for(self, category_id):
+        """Get the lock guarding a category's status entry."""
+        return self._shard_locks[hash(category_id) & (self.SHARD_COUNT - 1)]
+
+async_index_status = _StatusMap()
 
-# Thread-safe queue for background indexing tasks
-index_task_queue = Queue()
+# Thread-safe queue for background indexing tasks (C-level, no task_done bookkeeping)
+index_task_queue = SimpleQueue()
 
-# Flag to track if the background indexing thread is running
-background_thread_running = False
+# Wakes the long-lived indexer thread when a task is queued or shutdown is requested
+index_task_condition = threading.Condition()
+
+# Lifecycle of the background indexer thread
+INDEXER_STOPPED = 'stopped'    # never started, or exited
+INDEXER_RUNNING = 'running'
+INDEXER_STOPPING = 'stopping'  # shutdown requested, thread exits at next wakeup
+indexer_state = INDEXER_STOPPED
 
 # Constants for indexing
 LARGE_DIRECTORY_THRESHOLD = 50  # Number of files that triggers async indexing
+INDEX_STAT_WORKERS = 32  # Max threads stat-ing files concurrently (overlaps slow disk/NFS latency)
+PROGRESS_PUBLISH_INTERVAL = 0.1  # Seconds between progress updates, roughly the reader poll cadence
+
+def _stat_entry(stat_entry, entry):
+    """Stat a directory entry, returning (entry, (mode, size, mtime), error) so worker threads never raise."""
+    try:
+        return entry, stat_entry(entry), None
+    except Exception as stat_error:
+        return entry, None, stat_error
+
+def _progress_function(total_files):
+    """Return a processed-count -> percentage function specialized for this total."""
+    if total_files > 0:
+        # Cap at 99% until complete
+        return lambda processed: min(processed * 100 // total_files, 99)
+    # Unknown total, show 50%
+    return lambda processed: 50
 
 # Make the constant accessible as a class attribute
 
@@ -35,6 +82,26 @@ class IndexingService:
     
     LARGE_DIRECTORY_THRESHOLD = LARGE_DIRECTORY_THRESHOLD
     
+    @staticmethod
+    def stat_entries(entries, stat_entry):
+        """
+        Stat a list of directory entries, overlapping the calls on a thread
+        pool when there are more than LARGE_DIRECTORY_THRESHOLD of them.
+        
+        Args:
+            entries (list): os.DirEntry objects from scan_directory.
+            stat_entry (callable): The stat function yielded by scan_directory.
+            
+        Returns:
+            list: (entry, (mode, size, mtime), error) tuples in entry order.
+        """
+        if len(entries) <= LARGE_DIRECTORY_THRESHOLD:
+            return [_stat_entry(stat_entry, entry) for entry in entries]
+        # Stats run on native threads (also under gevent), so slow disks and
+        # network mounts serve many of them at once instead of one at a time
+        with native_thread_pool(INDEX_STAT_WORKERS) as executor:
+            return list(executor.map(lambda entry: _stat_entry(stat_entry, entry), entries))
+    
     @staticmethod
     def start_async_indexing(category_id, category_path, category_name, force_refresh=False):
         """
@@ -49,40 +116,83 @@ class IndexingService:
         Returns:
             dict: Initial status information.
         """
-        global async_index_status, background_thread_running, index_task_queue
+        global async_index_status, index_task_queue
         
         # Check if indexing is already in progress for this category
         if category_id in async_index_status and async_index_status[category_id]['status'] == 'running':
             logger.info(f"Async indexing already in progress for category '{category_name}'")
-            return async_index_status[category_id]
+            # The live status holds the worker's presized table; hand out the published prefix
+            return IndexingService.get_async_index_status(category_id)
         
-        # Initialize status
+        # A fresh index on disk needs no background task (load_index is memoized on mtime)
         current_time = time.time()
+        if not force_refresh:
+            index_data = load_index(category_path)
+            if index_data and 'timestamp' in index_data and 'files' in index_data:
+                cache_expiry = current_app.config.get('CACHE_EXPIRY', 300)
+                if is_index_fresh(index_data, category_path, cache_expiry, current_time):
+                    file_count = len(index_data['files'])
+                    status_info = {
+                        'status': 'complete',
+                        'progress': 100,
+                        'files': index_data['files'],
+                        'timestamp': index_data['timestamp'],
+                        'total_files': file_count,
+                        'processed_files': file_count
+                    }
+                    async_index_status[category_id] = status_info
+                    logger.info(f"Using existing index for '{category_name}', no async indexing needed")
+                    return status_info
+        
+        # Initialize status
         status_info = {
             'status': 'running',
             'progress': 0,
-            'files': [],  # Will be populated incrementally
+            'files': FileMetadataTable(),  # Will be populated incrementally
             'timestamp': current_time,
             'total_files': 0,  # Will be updated as we discover files
             'processed_files': 0
         }
         async_index_status[category_id] = status_info
         
-        # Add task to queue
-        index_task_queue.put({
+        task = {
             'category_id': category_id,
             'category_path': category_path,
             'category_name': category_name,
             'force_refresh': force_refresh,
             'timestamp': current_time
-        })
+        }
         
-        # Start background thread if not already running
-        if not background_thread_running:
-            IndexingService._start_background_indexer()
+        # Small directories are scanned inline, faster than the queue hand-off
+        # costs; thumbnail generation is still left to the background indexer
+        if not is_large_directory(category_path, LARGE_DIRECTORY_THRESHOLD):
+            logger.info(f"Indexing small category '{category_name}' synchronously")
+            task['inline'] = True
+            IndexingService._process_indexing_task(task)
+            return IndexingService.get_async_index_status(category_id)
+        
+        IndexingService._queue_task(task)
         
         logger.info(f"Queued async indexing task for category '{category_name}'")
-        return status_info
+        # The worker may already have replaced the files table with its presized one
+        return IndexingService.get_async_index_status(category_id)
+    
+    @staticmethod
+    def _queue_task(task):
+        """
+        Queue a task for the background indexer, starting it if needed.
+        
+        Args:
+            task (dict): Indexing task, or a thumbnail task (type 'thumbnails').
+        """
+        # Add task to queue and wake the indexer
+        with index_task_condition:
+            index_task_queue.put(task)
+            index_task_condition.notify()
+        
+        # Start background thread if not already running
+        if indexer_state == INDEXER_STOPPED:
+            IndexingService._start_background_indexer()
     
     @staticmethod
     def get_async_index_status(category_id):
@@ -96,210 +206,313 @@ class IndexingService:
             dict: Status information or None if no indexing has been started.
         """
         global async_index_status
-        return async_index_status.get(category_id)
+        status = async_index_status.get(category_id)
+        if status is None:
+            return None
+        
+        # Hand out a consistent shallow copy; while running, the worker appends
+        # to the live files list, so copy only the published prefix
+        with async_index_status.lock_for(category_id):
+            if status['status'] != 'running':
+                return dict(status)
+            return dict(status, files=status['files'][:status['processed_files']])
     
     @staticmethod
     def _background_indexer_worker():
         """
-        Background worker that processes indexing tasks from the queue.
-        This method runs in a separate thread with its own Flask application context.
-        It processes tasks from the index_task_queue and updates the async_index_status.
+        Long-lived background worker that processes indexing tasks from the queue.
+        This method runs in a daemon thread with its own Flask application context.
+        Between tasks it sleeps on index_task_condition instead of exiting, so later
+        indexing requests do not pay for a new thread.
         """
-        global background_thread_running, index_task_queue, async_index_status
+        global indexer_state
         
-        background_thread_running = True
         logger.info("Background indexer thread started")
         
         try:
             while True:
-                try:
-                    # Get task with timeout to allow for graceful shutdown
-                    task = index_task_queue.get(timeout=5)
-                    
-                    category_id = task['category_id']
-                    category_path = task['category_path']
-                    category_name = task['category_name']
-                    force_refresh = task['force_refresh']
-                    
-                    logger.info(f"Processing async indexing task for '{category_name}'")
-                    
-                    try:
-                        # Check if directory exists and is accessible
-                        if not os.path.exists(category_path) or not os.path.isdir(category_path):
-                            logger.error(f"Category path does not exist or is not a directory: {category_path}")
-                            async_index_status[category_id]['status'] = 'error'
-                            async_index_status[category_id]['error'] = "Directory not found or not accessible"
-                            index_task_queue.task_done()  # Mark task as done
-                            continue
-                        
-                        # Try to load existing index if not forcing refresh
-                        all_files_metadata = []
-                        if not force_refresh:
-                            try:
-                                index_data = load_index(category_path)
-                                if index_data and 'timestamp' in index_data and 'files' in index_data:
-                                    # Use app config for cache expiry if available, otherwise default
-                                    cache_expiry = current_app.config.get('CACHE_EXPIRY', 300)
-                                    if time.time() - index_data['timestamp'] <= cache_expiry:
-                                        logger.info(f"Using existing index for async indexing of '{category_name}' (cache valid for {cache_expiry}s)")
-                                        async_index_status[category_id]['status'] = 'complete'
-                                        async_index_status[category_id]['files'] = index_data['files']
-                                        async_index_status[category_id]['progress'] = 100
-                                        async_index_status[category_id]['total_files'] = len(index_data['files'])
-                                        async_index_status[category_id]['processed_files'] = len(index_data['files'])
-                                        index_task_queue.task_done()  # Mark task as done
-                                        continue
-                            except Exception as load_error:
-                                logger.error(f"Error loading index in background worker: {load_error}")
-                                # Continue with rebuilding the index
-                        
-                        # Get total file count for progress tracking (approximate)
-                        total_files = 0
-                        try:
-                            total_files = sum(1 for f in os.listdir(category_path) if is_media_file(f))
-                            async_index_status[category_id]['total_files'] = total_files
-                            logger.info(f"Found {total_files} media files in '{category_name}' for indexing")
-                        except Exception as count_error:
-                            logger.error(f"Error counting files in {category_path}: {count_error}")
-                            # Continue with unknown total
-                        
-                        # Process files in chunks
-                        processed = 0
-                        chunk_size = 10  # Process files in smaller chunks for more frequent updates
-                        
-                        # Create a list to store metadata
-                        all_files_metadata = []
-                        
-                        # Process each file in the directory
-                        for filename in os.listdir(category_path):
-                            if is_media_file(filename):
-                                try:
-                                    filepath = os.path.join(category_path, filename)
-                                    stats = os.stat(filepath)
-                                    file_meta = {
-                                        'name': filename,
-                                        'size': stats.st_size,
-                                        'mtime': stats.st_mtime
-                                    }
-                                    all_files_metadata.append(file_meta)
-                                    
-                                    # Update status
-                                    processed += 1
-                                    async_index_status[category_id]['processed_files'] = processed
-                                    
-                                    # Update progress percentage
-                                    if total_files > 0:
-                                        progress = min(int((processed / total_files) * 100), 99)  # Cap at 99% until complete
-                                    else:
-                                        progress = 50  # Unknown total, show 50%
-                                    
-                                    async_index_status[category_id]['progress'] = progress
-                                    
-                                    # Update files list in chunks to avoid excessive memory usage
-                                    if processed % chunk_size == 0:
-                                        async_index_status[category_id]['files'] = all_files_metadata.copy()
-                                        logger.info(f"Processed {processed} files for '{category_name}' ({progress}%)")
-                                    
-                                except FileNotFoundError:
-                                    logger.warning(f"File disappeared during async indexing: {filename}")
-                                except Exception as file_error:
-                                    logger.warning(f"Error processing file {filename} during async indexing: {file_error}")
-                        
-                        # Always update the files list at the end
-                        async_index_status[category_id]['files'] = all_files_metadata
-                        logger.info(f"Finished processing all {processed} files for '{category_name}'")
-                        
-                        # Process thumbnails for all videos and one image (for category preview)
-                        try:
-                            image_count, video_count, thumbnails_generated = process_category_thumbnails(
-                                category_path, all_files_metadata, force_refresh
-                            )
-                            logger.info(f"Processed thumbnails for '{category_name}': {thumbnails_generated} generated/updated "
-                                       f"({video_count} videos, {image_count} images)")
-                        except Exception as thumb_error:
-                            logger.error(f"Error processing thumbnails for '{category_name}': {thumb_error}")
-                            logger.debug(traceback.format_exc())
-                            # Continue with saving the index even if thumbnail processing fails
-                        
-                        # Save the complete index
-                        current_time = time.time()
-                        new_index_data = {'timestamp': current_time, 'files': all_files_metadata}
-                        
-                        # Save the index using the utility function
-                        save_success = False
-                        try:
-                            save_success = save_index(category_path, new_index_data)
-                            if save_success:
-                                logger.info(f"Successfully saved index in background worker for '{category_name}'")
-                            else:
-                                logger.error(f"Failed to save index in background worker for '{category_name}'")
-                        except Exception as save_error:
-                            logger.error(f"Error saving index in background worker: {save_error}")
-                        
-                        # Update final status
-                        async_index_status[category_id]['status'] = 'complete'
-                        async_index_status[category_id]['progress'] = 100
-                        async_index_status[category_id]['timestamp'] = current_time
-                        
-                        logger.info(f"Completed async indexing for '{category_name}': {processed} files indexed, index saved: {save_success}")
-                        
-                    except Exception as task_error:
-                        logger.error(f"Error during async indexing of '{category_name}': {task_error}")
-                        logger.debug(traceback.format_exc())
-                        async_index_status[category_id]['status'] = 'error'
-                        async_index_status[category_id]['error'] = str(task_error)
-                    
-                    # Mark task as done
-                    index_task_queue.task_done()
-                    
-                except Empty:
-                    # No tasks in queue, check if we should exit
-                    if index_task_queue.empty():
-                        logger.debug("No indexing tasks in queue, background thread will exit")
+                with index_task_condition:
+                    index_task_condition.wait_for(
+                        lambda: not index_task_queue.empty() or indexer_state == INDEXER_STOPPING
+                    )
+                    if indexer_state == INDEXER_STOPPING:
                         break
+                    task = index_task_queue.get_nowait()
                 
+                try:
+                    if task.get('type') == 'thumbnails':
+                        IndexingService._process_thumbnail_task(task)
+                    else:
+                        IndexingService._process_indexing_task(task)
                 except Exception as e:
                     logger.error(f"Unexpected error in background indexer: {e}")
                     logger.debug(traceback.format_exc())
                     # Continue processing other tasks
         
         finally:
-            background_thread_running = False
+            indexer_state = INDEXER_STOPPED
             logger.info("Background indexer thread stopped")
     
     @staticmethod
-    def _start_background_indexer():
-        """Start the background indexer thread."""
-        global background_thread_running
+    def _process_indexing_task(task):
+        """
+        Index one category directory and publish progress to async_index_status.
         
-        if not background_thread_running:
-            try:
-                logger.info("Starting background indexer thread...")
+        Args:
+            task (dict): Task queued by start_async_indexing.
+        """
+        category_id = task['category_id']
+        category_path = task['category_path']
+        category_name = task['category_name']
+        force_refresh = task['force_refresh']
+        status = async_index_status[category_id]
+        status_lock = async_index_status.lock_for(category_id)
+        
+        logger.info(f"Processing async indexing task for '{category_name}'")
+        
+        try:
+            # Check if directory exists and is accessible
+            if not os.path.exists(category_path) or not os.path.isdir(category_path):
+                logger.error(f"Category path does not exist or is not a directory: {category_path}")
+                with status_lock:
+                    status.update(status='error', error="Directory not found or not accessible")
+                return
+            
+            # Try to load existing index if not forcing refresh
+            all_files_metadata = []
+            if not force_refresh:
+                try:
+                    index_data = load_index(category_path)
+                    if index_data and 'timestamp' in index_data and 'files' in index_data:
+                        # Use app config for cache expiry if available, otherwise default
+                        cache_expiry = current_app.config.get('CACHE_EXPIRY', 300)
+                        if is_index_fresh(index_data, category_path, cache_expiry):
+                            logger.info(f"Using existing index for async indexing of '{category_name}' (cache valid for {cache_expiry}s)")
+                            with status_lock:
+                                status.update(
+                                    status='complete',
+                                    files=index_data['files'],
+                                    progress=100,
+                                    total_files=len(index_data['files']),
+                                    processed_files=len(index_data['files'])
+                                )
+                            return
+                except Exception as load_error:
+                    logger.error(f"Error loading index in background worker: {load_error}")
+                    # Continue with rebuilding the index
+            
+            # Taken before the scan, so changes made while scanning invalidate the index;
+            # .ghosthub is created first so saving the index does not change it either
+            ensure_ghosthub_dir(category_path)
+            dir_mtime = get_directory_mtime(category_path)
+            
+            # The previous index (memoized, so cheap) estimates the total until
+            # the directory listing is exhausted and the exact count is known
+            previous_index = load_index(category_path)
+            previous_files = previous_index.get('files') if previous_index else None
+            previous_files = previous_files or FileMetadataTable()
+            total_files = len(previous_files)
+            status['total_files'] = total_files
+            progress_for = _progress_function(total_files)
+            
+            processed = 0
+            last_publish = time.monotonic()
+            
+            # Create a column table to store metadata, published by reference and
+            # only ever written by this worker. It is presized from the previous
+            # index so a rebuild fills rows instead of regrowing the columns;
+            # readers only see the first processed_files entries.
+            all_files_metadata = FileMetadataTable.with_capacity(total_files)
+            status['files'] = all_files_metadata
+            
+            def record_file(name, size, mtime):
+                nonlocal processed, last_publish
+                all_files_metadata.set(processed, name, size, mtime)
+                processed += 1
                 
-                # Get the current Flask app instance
-                from flask import current_app
-                app = current_app._get_current_object()
+                # Status is polled at human timescales, so publish progress on a
+                # wall-clock interval regardless of how fast files are coming in
+                now = time.monotonic()
+                if now - last_publish < PROGRESS_PUBLISH_INTERVAL:
+                    return
+                last_publish = now
                 
-                # Create a function that will run in the thread with the app context
-                def run_with_app_context():
-                    with app.app_context():
-                        logger.info("Background indexer thread started with app context")
-                        IndexingService._background_indexer_worker()
+                progress = progress_for(processed)
+                with status_lock:
+                    status.update(processed_files=processed, progress=progress)
                 
-                # Start the thread with the wrapper function
-                indexer_thread = threading.Thread(
-                    target=run_with_app_context,
-                    daemon=True  # Make thread a daemon so it exits when main thread exits
-                )
-                indexer_thread.start()
-                logger.info("Successfully started background indexer thread")
+                logger.info("Processed %d files for '%s' (%d%%)", processed, category_name, progress)
+            
+            # Per-file logging on the hot path uses lazy %-style arguments so
+            # nothing is formatted when the level is filtered out
+            warn = logger.warning
+            
+            def record_stat_result(result):
+                entry, stats, stat_error = result
+                if stat_error is None:
+                    # Media-named directories and other special files are not indexed
+                    mode, size, mtime = stats
+                    if stat.S_ISREG(mode):
+                        record_file(entry.name, size, mtime)
+                elif isinstance(stat_error, FileNotFoundError):
+                    warn("File disappeared during async indexing: %s", entry.name)
+                else:
+                    warn("Error processing file %s during async indexing: %s", entry.name, stat_error)
+            
+            def publish_total(total_files):
+                nonlocal progress_for
+                status['total_files'] = total_files
+                progress_for = _progress_function(total_files)
+                logger.info(f"Found {total_files} media files in '{category_name}' for indexing")
+            
+            media_exts = media_extensions()
+            splitext = os.path.splitext
+            with scan_directory(category_path) as (entries, stat_entry):
+                media_entries = (entry for entry in entries if splitext(entry.name)[1].lower() in media_exts)
                 
-                # Verify the thread is running
-                if indexer_thread.is_alive():
-                    logger.info("Background indexer thread is alive")
+                if task.get('inline'):
+                    # Small directory on the request thread: stat serially, as
+                    # stat_entries does below the threshold, without a pool
+                    for entry in media_entries:
+                        record_stat_result(_stat_entry(stat_entry, entry))
+                    publish_total(processed)
+                else:
+                    # Stream the directory in one pass: stats start on the thread
+                    # pool while entries are still being read, and are recorded in order
+                    pending = deque()
+                    with native_thread_pool(INDEX_STAT_WORKERS) as executor:
+                        for entry in media_entries:
+                            pending.append(executor.submit(_stat_entry, stat_entry, entry))
+                            while pending and pending[0].done():
+                                record_stat_result(pending.popleft().result())
+                        
+                        publish_total(processed + len(pending))
+                        
+                        while pending:
+                            record_stat_result(pending.popleft().result())
+            
+            # Drop unused slots left when files disappeared since the last index
+            # and sort by name, then always update the files list at the end
+            with status_lock:
+                all_files_metadata.truncate(processed)
+                all_files_metadata.sort_by_name()
+                status.update(files=all_files_metadata, total_files=processed, processed_files=processed)
+            logger.info(f"Finished processing all {processed} files for '{category_name}'")
+            
+            # Process thumbnails for all videos and one image (for category preview),
+            # off the request thread when this task was run inline
+            thumbnail_task = {
+                'type': 'thumbnails',
+                'category_path': category_path,
+                'category_name': category_name,
+                'files': all_files_metadata,
+                'force_refresh': force_refresh
+            }
+            if task.get('inline'):
+                IndexingService._queue_task(thumbnail_task)
+            else:
+                IndexingService._process_thumbnail_task(thumbnail_task)
+            
+            # Save the complete index
+            current_time = time.time()
+            new_index_data = {'timestamp': current_time, 'dir_mtime': dir_mtime, 'files': all_files_metadata}
+            
+            # Save the index using the utility function
+            save_success = False
+            try:
+                save_success = save_index(category_path, new_index_data)
+                if save_success:
+                    logger.info(f"Successfully saved index in background worker for '{category_name}'")
                 else:
-                    logger.error("Background indexer thread failed to start")
-            except Exception as e:
-                logger.error(f"Error starting background indexer thread: {e}")
-                logger.debug(traceback.format_exc())
-                background_thread_running = False
+                    logger.error(f"Failed to save index in background worker for '{category_name}'")
+            except Exception as save_error:
+                logger.error(f"Error saving index in background worker: {save_error}")
+            
+            # Update final status
+            with status_lock:
+                status.update(status='complete', progress=100, timestamp=current_time)
+            
+            logger.info(f"Completed async indexing for '{category_name}': {processed} files indexed, index saved: {save_success}")
+        
+        except Exception as task_error:
+            logger.error(f"Error during async indexing of '{category_name}': {task_error}")
+            logger.debug(traceback.format_exc())
+            with status_lock:
+                status.update(status='error', error=str(task_error))
+
+    @staticmethod
+    def _process_thumbnail_task(task):
+        """
+        Generate the thumbnails for an indexed category.
+        
+        Args:
+            task (dict): Thumbnail task built by _process_indexing_task.
+        """
+        category_name = task['category_name']
+        try:
+            image_count, video_count, thumbnails_generated = process_category_thumbnails(
+                task['category_path'], task['files'], task['force_refresh']
+            )
+            logger.info(f"Processed thumbnails for '{category_name}': {thumbnails_generated} generated/updated "
+                       f"({video_count} videos, {image_count} images)")
+        except Exception as thumb_error:
+            logger.error(f"Error processing thumbnails for '{category_name}': {thumb_error}")
+            logger.debug(traceback.format_exc())
+            # The index is saved even if thumbnail processing fails
+    
+    @staticmethod
+    def _start_background_indexer():
+        """Start the background indexer thread."""
+        global indexer_state
+        
+        with index_task_condition:
+            if indexer_state != INDEXER_STOPPED:
+                return
+            indexer_state = INDEXER_RUNNING
+        
+        try:
+            logger.info("Starting background indexer thread...")
+            
+            # Get the current Flask app instance
+            from flask import current_app
+            app = current_app._get_current_object()
+            
+            # The app context is pushed once and stays active for the whole
+            # lifetime of the long-lived worker, not once per task
+            def run_with_app_context():
+                ctx = app.app_context()
+                ctx.push()
+                try:
+                    logger.info("Background indexer thread started with app context")
+                    IndexingService._background_indexer_worker()
+                finally:
+                    ctx.pop()
+            
+            # Start the thread with the wrapper function
+            indexer_thread = threading.Thread(
+                target=run_with_app_context,
+                daemon=True  # Make thread a daemon so it exits when main thread exits
+            )
+            indexer_thread.start()
+            logger.info("Successfully started background indexer thread")
+            
+            # Verify the thread is running
+            if indexer_thread.is_alive():
+                logger.info("Background indexer thread is alive")
+            else:
+                logger.error("Background indexer thread failed to start")
+        except Exception as e:
+            logger.error(f"Error starting background indexer thread: {e}")
+            logger.debug(traceback.format_exc())
+            indexer_state = INDEXER_STOPPED
+
+
+def _stop_background_indexer():
+    """Ask the background indexer thread to exit at interpreter shutdown."""
+    global indexer_state
+    with index_task_condition:
+        if indexer_state == INDEXER_RUNNING:
+            indexer_state = INDEXER_STOPPING
+            index_task_condition.notify_all()
+
+atexit.register(_stop_background_indexer)
@@ -6,51 +6,173 @@ Supports both shuffled and synchronized viewing modes.
 """
 # app/services/media_service.py
 import os
+import stat
 import time
 import random
-import uuid
 import logging
+import threading
 import traceback
+from collections import OrderedDict
+from functools import lru_cache
+from urllib.parse import quote
 from flask import current_app, session, request
-from app.utils.media_utils import is_media_file, get_media_type, get_thumbnail_url, process_category_thumbnails
+from app.utils.media_utils import media_extensions, get_media_type, get_thumbnail_url, process_category_thumbnails
 from app.services.category_service import CategoryService
 from app.services.indexing_service import IndexingService
-from app.utils.file_utils import load_index, save_index, is_large_directory
+from app.utils.file_utils import (
+    FileMetadataTable, load_index, save_index, is_large_directory, scan_directory,
+    get_directory_mtime, is_index_fresh, ensure_ghosthub_dir
+)
 
 logger = logging.getLogger(__name__)
 
-# Session tracking: {category_id: {session_id: {"seen": set(), "order": [], "last_access": timestamp}}}
-seen_files_tracker = {}
-last_session_cleanup = time.time()
+class SessionState:
+    """
+    Shuffle state for one viewer session in one category.
+    
+    cursor is how far into order the session has paged; the order is
+    reshuffled once it reaches the end.
+    """
+    __slots__ = ('order', 'cursor', 'last_access')
+    
+    def __init__(self, last_access, order=None, cursor=0):
+        self.order = order if order is not None else []
+        self.cursor = cursor
+        self.last_access = last_access
+
+class LazyShuffle:
+    """
+    Random permutation of a list of filenames, shuffled only as far as it is read.
+    
+    Runs Fisher-Yates incrementally: reading position i fixes every position
+    up to i, so serving the first pages of a huge category costs O(page size)
+    rather than a shuffle of the whole list. Positions displaced by a swap but
+    not yet read are tracked sparsely in a dict.
+    
+    Supports len(), indexing and slicing like the list it replaces. The
+    underlying names list must not be mutated while the shuffle is in use.
+    """
+    __slots__ = ('_names', '_shuffled', '_swaps', '_lock')
+    
+    def __init__(self, names):
+        self._names = names
+        self._shuffled = []  # Fixed prefix of the permutation
+        self._swaps = {}     # Unread position -> index into names, where it differs from the position
+        self._lock = threading.Lock()
+    
+    def _extend(self, upto):
+        """Fix the permutation for every position below upto."""
+        shuffled = self._shuffled
+        if len(shuffled) >= upto:
+            return
+        with self._lock:
+            names = self._names
+            swaps = self._swaps
+            total = len(names)
+            randrange = random.randrange
+            for position in range(len(shuffled), min(upto, total)):
+                target = randrange(position, total)
+                picked = swaps.get(target, target)
+                if target != position:
+                    swaps[target] = swaps.get(position, position)
+                swaps.pop(position, None)
+                shuffled.append(names[picked])
+    
+    def __len__(self):
+        return len(self._names)
+    
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self._names))
+            # Fix only the positions the slice reads: up to stop going forward,
+            # and down from start when stepping backwards
+            if step > 0:
+                self._extend(stop)
+                return self._shuffled[start:stop:step]
+            self._extend(start + 1)
+            # stop may be -1 here, which a list slice would read as the last item
+            shuffled = self._shuffled
+            return [shuffled[i] for i in range(start, stop, step)]
+        if key < 0:
+            key += len(self._names)
+        if not 0 <= key < len(self._names):
+            raise IndexError('LazyShuffle index out of range')
+        self._extend(key + 1)
+        return self._shuffled[key]
+    
+    def __iter__(self):
+        self._extend(len(self._names))
+        return iter(self._shuffled)
+
+# Session tracking: OrderedDict((category_id, session_id): SessionState)
+# One global LRU, kept in access order with the least recently used session first.
+seen_files_tracker = OrderedDict()
+# Guards seen_files_tracker and sync_mode_order between requests and the cleanup thread;
+# reentrant so clean_sessions and clear_session_tracker can nest the tracker helpers
+session_tracker_lock = threading.RLock()
+session_cleanup_thread = None
 
 # Sync mode file order: {category_id: sorted_files_list}
 sync_mode_order = {}
 
 # Constants for memory management
-MAX_SESSIONS_PER_CATEGORY = 50  # Maximum number of sessions to track per category
+MAX_TRACKED_SESSIONS = 1000  # Maximum number of (category, session) pairs to track
 SESSION_EXPIRY = 3600  # Session data expires after 1 hour of inactivity
+SESSION_CLEANUP_INTERVAL = 300  # Seconds between background session tracker sweeps
+SESSION_TOUCH_INTERVAL = 1.0  # Minimum seconds between last-access updates for a session
 
 # Use IndexingService.LARGE_DIRECTORY_THRESHOLD instead of defining it here
 
+# category_id -> category dict; misses are never cached so new categories are found
+_category_cache = {}
+
+def _cached_category(category_id):
+    """
+    Memoized CategoryService.get_category_by_id, so media requests skip
+    re-reading the categories file. Cleared by clear_category_cache.
+    """
+    category = _category_cache.get(category_id)
+    if category is None:
+        category = CategoryService.get_category_by_id(category_id)
+        if category is not None:
+            _category_cache[category_id] = category
+    return category
+
+@lru_cache(maxsize=128)
+def _real_base(category_path):
+    """Memoized os.path.realpath of a category directory. Cleared by clear_category_cache."""
+    return os.path.realpath(category_path)
+
+def clear_category_cache():
+    """Forget memoized category lookups after categories are added, edited or removed."""
+    _category_cache.clear()
+    _real_base.cache_clear()
+
 class MediaService:
     """Service for managing media files, listings, and viewing sessions."""
 
     @staticmethod
-    def _load_or_rebuild_index(category_path, category_name, category_id, force_refresh, cache_expiry):
+    def _load_or_rebuild_index(category_path, category_name, category_id, force_refresh, cache_expiry, preloaded_index=None):
         """
         Loads a media index from cache or rebuilds it from the directory.
         Handles index validation, saving, and triggers async indexing or sync thumbnail processing.
+        preloaded_index, if given, is index data the caller already loaded for this path.
         Returns all_files_metadata list or None if path is invalid.
         """
         current_time = time.time()
         all_files_metadata = None
 
         # 1. Try loading the index
-        index_data = load_index(category_path) if not force_refresh else None
+        if force_refresh:
+            index_data = None
+        elif preloaded_index is not None:
+            index_data = preloaded_index
+        else:
+            index_data = load_index(category_path)
 
         # 2. Validate the loaded index
         if index_data and 'timestamp' in index_data and 'files' in index_data:
-            if current_time - index_data['timestamp'] <= cache_expiry:
+            if is_index_fresh(index_data, category_path, cache_expiry, current_time):
                 all_files_metadata = index_data['files']
                 logger.info(f"Using valid index file for '{category_name}' ({len(all_files_metadata)} files)")
             else:
@@ -75,25 +197,33 @@ class MediaService:
 
             try:
                 logger.info(f"Scanning all files for '{category_name}' to create index")
-                current_files_metadata = []
-                for filename in os.listdir(category_path):
-                    if is_media_file(filename):
-                        try:
-                            filepath = os.path.join(category_path, filename)
-                            stats = os.stat(filepath)
-                            current_files_metadata.append({
-                                'name': filename,
-                                'size': stats.st_size,
-                                'mtime': stats.st_mtime
-                            })
-                        except FileNotFoundError:
-                            logger.warning(f"File disappeared during indexing: {filepath}")
-                        except Exception as stat_error:
-                            logger.warning(f"Could not get stats for file {filepath}: {stat_error}")
+                # Taken before the scan, so changes made while scanning invalidate the index;
+                # .ghosthub is created first so saving the index does not change it either
+                ensure_ghosthub_dir(category_path)
+                dir_mtime = get_directory_mtime(category_path)
+                current_files_metadata = FileMetadataTable()
+                # One scandir pass; only media-named entries are stat()ed
+                media_exts = media_extensions()
+                splitext = os.path.splitext
+                with scan_directory(category_path) as (entries, stat_entry):
+                    candidates = [entry for entry in entries if splitext(entry.name)[1].lower() in media_exts]
+                    stat_results = IndexingService.stat_entries(candidates, stat_entry)
                 
+                for entry, stats, stat_error in stat_results:
+                    filename = entry.name
+                    if stat_error is None:
+                        mode, size, mtime = stats
+                        if stat.S_ISREG(mode):
+                            current_files_metadata.append(filename, size, mtime)
+                    elif isinstance(stat_error, FileNotFoundError):
+                        logger.warning(f"File disappeared during indexing: {filename}")
+                    else:
+                        logger.warning(f"Could not get stats for file {filename}: {stat_error}")
+                
+                current_files_metadata.sort_by_name()
                 all_files_metadata = current_files_metadata # Assign scanned files
                 
-                new_index_data = {'timestamp': time.time(), 'files': all_files_metadata}
+                new_index_data = {'timestamp': time.time(), 'dir_mtime': dir_mtime, 'files': all_files_metadata}
                 try:
                     index_saved = save_index(category_path, new_index_data)
                     if index_saved:
@@ -103,7 +233,8 @@ class MediaService:
                 except Exception as save_error:
                     logger.error(f"Error saving index for '{category_name}': {save_error}")
                 
-                if is_large_directory(category_path, IndexingService.LARGE_DIRECTORY_THRESHOLD):
+                # The scan just counted the files, so no need to ask is_large_directory
+                if len(all_files_metadata) > IndexingService.LARGE_DIRECTORY_THRESHOLD:
                     logger.info(f"Large directory detected for '{category_name}', starting async indexing")
                     IndexingService.start_async_indexing(
                         category_id, 
@@ -135,27 +266,33 @@ class MediaService:
     def _determine_file_order(all_files_metadata, category_id, session_id, shuffle_preference, force_refresh, category_name):
         """
         Determines the order of media files based on shuffle preference, sync state, and session data.
+        A session_id of None (no cookie) gets a one-off order that is not tracked.
         Returns a list of filenames in the determined order.
         """
         from .sync_service import SyncService # Local import due to potential circularity
         global seen_files_tracker, sync_mode_order
 
-        all_filenames = [f_meta['name'] for f_meta in all_files_metadata]
+        all_filenames = all_files_metadata.names  # Shared with the index; never mutated here
         total_files_in_directory = len(all_filenames)
 
         current_time = time.time()
-        if category_id not in seen_files_tracker:
-            seen_files_tracker[category_id] = {}
-        if session_id not in seen_files_tracker[category_id]:
-            seen_files_tracker[category_id][session_id] = {
-                "seen": set(), 
-                "order": [],
-                "last_access": current_time
-            }
+        session_key = (category_id, session_id)
+        if session_id is None:
+            session_data = SessionState(current_time)
         else:
-            seen_files_tracker[category_id][session_id]["last_access"] = current_time
-
-        session_data = seen_files_tracker[category_id][session_id]
+            with session_tracker_lock:
+                session_data = seen_files_tracker.get(session_key)
+                if session_data is None:
+                    session_data = SessionState(current_time)
+                    seen_files_tracker[session_key] = session_data
+                    # Evict least recently used sessions once over the limit
+                    while len(seen_files_tracker) > MAX_TRACKED_SESSIONS:
+                        seen_files_tracker.popitem(last=False)
+                elif current_time - session_data.last_access >= SESSION_TOUCH_INTERVAL:
+                    # Bursty paging touches the same session many times a second; expiry
+                    # works in minutes, so finer timestamps and reordering buy nothing
+                    session_data.last_access = current_time
+                    seen_files_tracker.move_to_end(session_key)
         
         # Check if we should use the sync session order
         sync_active_order = None
@@ -164,122 +301,135 @@ class MediaService:
             if sync_active_order:
                 logger.info(f"Using active sync session order for category {category_id} with {len(sync_active_order)} items")
                 # Clear session-specific shuffle data when using an active sync order
-                if session_data["order"] or session_data["seen"]:
-                    session_data["order"] = []
-                    session_data["seen"].clear()
+                if session_data.order or session_data.cursor:
+                    session_data.order = []
+                    session_data.cursor = 0
                     logger.debug(f"Cleared session shuffle data for session {session_id} in category {category_id} due to active sync.")
                 return sync_active_order # Return the active sync order directly
 
         # If not in active sync or no specific sync order, proceed with shuffle/sort logic
         if shuffle_preference:
-            ordered_files_from_session = session_data["order"]
-            seen_files_from_session = session_data["seen"]
-            if not ordered_files_from_session or force_refresh or len(seen_files_from_session) >= total_files_in_directory:
-                if len(seen_files_from_session) >= total_files_in_directory:
+            ordered_files_from_session = session_data.order
+            all_files_seen = session_data.cursor >= total_files_in_directory
+            if not ordered_files_from_session or force_refresh or all_files_seen:
+                if all_files_seen:
                     logger.info(f"All files seen for session {session_id} in '{category_name}', reshuffling.")
-                    seen_files_from_session.clear()
+                session_data.cursor = 0
 
-                files_to_shuffle = all_filenames.copy()
-                random.shuffle(files_to_shuffle)
-                session_data["order"] = files_to_shuffle
-                logger.info(f"Generated new shuffled order ({len(files_to_shuffle)} files) for session {session_id} in '{category_name}'")
-            return session_data["order"]
+                # Only the pages actually requested get shuffled
+                session_data.order = LazyShuffle(all_filenames)
+                logger.info(f"Generated new shuffled order ({total_files_in_directory} files) for session {session_id} in '{category_name}'")
+            return session_data.order
         else: # Not shuffling (e.g., default for sync mode if no active sync order, or if shuffle=False passed)
             if force_refresh or category_id not in sync_mode_order:
-                sync_mode_order[category_id] = sorted(all_filenames)
+                # Index tables are kept sorted by name, so the names column is the order
+                sync_mode_order[category_id] = all_filenames
                 log_message = "Refreshed" if force_refresh else "Generated"
                 logger.info(f"{log_message} consistent sorted order for non-shuffle/sync mode in category '{category_name}' ({len(sync_mode_order[category_id])} files)")
             
             # Clear session-specific shuffle data if we are falling back to sorted order
-            if session_data["order"] or session_data["seen"]:
-                 session_data["order"] = []
-                 session_data["seen"].clear()
+            if session_data.order or session_data.cursor:
+                 session_data.order = []
+                 session_data.cursor = 0
                  logger.debug(f"Cleared session shuffle data for session {session_id} in category {category_id} due to non-shuffle mode.")
             return sync_mode_order[category_id]
 
     @staticmethod
-    def _prepare_paginated_response_data(paginated_filenames, category_id, all_files_metadata_lookup):
+    def _prepare_paginated_response_data(paginated_filenames, category_id, all_files_metadata):
         """
         Prepares the detailed media information for a list of paginated filenames.
         """
-        from urllib.parse import quote # Local import due to potential circularity
-        paginated_media_info = []
+        # Media types and quoted names are cached on the (memoized) index table,
+        # so they are computed once per index rather than on every request
+        media_types = all_files_metadata.derived_column('media_type', get_media_type)
+        quoted_names = all_files_metadata.derived_column('quoted_name', quote)
+        names = all_files_metadata.names
+        sizes = all_files_metadata.sizes
+        row_lookup = all_files_metadata.row_lookup()
+
+        rows = []
         for filename in paginated_filenames:
-            try:
-                file_meta = all_files_metadata_lookup.get(filename)
-                if not file_meta:
-                    logger.warning(f"Metadata not found in index for file: {filename}. Skipping.")
-                    continue
-
-                file_type = get_media_type(filename)
-                info = {
-                    'name': filename,
-                    'type': file_type,
-                    'size': file_meta.get('size', 0),
-                    'url': f'/media/{category_id}/{quote(filename)}'
-                }
-                if file_type == 'video':
-                    info['thumbnailUrl'] = get_thumbnail_url(category_id, filename)
-                paginated_media_info.append(info)
-            except Exception as file_proc_error:
-                logger.error(f"Error preparing response data for file '{filename}' in category '{category_id}': {file_proc_error}")
-                paginated_media_info.append({
-                    'name': filename, 'type': 'error', 'size': 0, 'url': None,
-                    'error': f"Failed to process file: {str(file_proc_error)}"
-                })
+            row = row_lookup.get(filename)
+            if row is None:
+                logger.warning(f"Metadata not found in index for file: {filename}. Skipping.")
+            else:
+                rows.append(row)
+
+        # Every value comes from the pre-validated index columns, so the
+        # entries are built in one comprehension with no per-item error handling
+        url_prefix = f'/media/{category_id}/'
+        paginated_media_info = [
+            {'name': names[row], 'type': media_types[row], 'size': sizes[row], 'url': url_prefix + quoted_names[row]}
+            for row in rows
+        ]
+        for info in paginated_media_info:
+            if info['type'] == 'video':
+                info['thumbnailUrl'] = get_thumbnail_url(category_id, info['name'])
         return paginated_media_info
 
     @staticmethod
     def clean_sessions():
-        """Remove inactive sessions and enforce session limits."""
-        global last_session_cleanup
+        """
+        Remove inactive sessions and enforce session limits.
+        Runs periodically on the background thread started by start_session_cleanup.
+        """
         global seen_files_tracker
         
         current_time = time.time()
-        # Only run session cleanup periodically
-        cleanup_interval = 300  # 5 minutes
-        if current_time - last_session_cleanup <= cleanup_interval:
-            return
-            
         logger.info("Starting session tracker cleanup...")
         session_expiry = current_app.config.get('SESSION_EXPIRY', SESSION_EXPIRY)
-        categories_cleaned = 0
+        with session_tracker_lock:
+            sessions_removed = MediaService._evict_sessions(current_time, session_expiry)
+        
+        logger.info(f"Session cleanup complete: removed {sessions_removed} inactive sessions.")
+
+    @staticmethod
+    def _evict_sessions(current_time, session_expiry):
+        """
+        Drop expired sessions (not accessed recently).
+        Caller must hold session_tracker_lock.
+        
+        Returns:
+            int: Number of sessions removed.
+        """
+        # The tracker is in access order, so expired sessions are all at the
+        # front and the scan stops at the first live one
+        expiry_cutoff = current_time - session_expiry
         sessions_removed = 0
+        while seen_files_tracker:
+            session_data = next(iter(seen_files_tracker.values()))
+            if session_data.last_access >= expiry_cutoff:
+                break
+            seen_files_tracker.popitem(last=False)
+            sessions_removed += 1
+        return sessions_removed
+
+    @staticmethod
+    def start_session_cleanup(app):
+        """
+        Start the daemon thread that periodically prunes the session tracker,
+        keeping that work off the request path. Safe to call more than once.
         
-        # For each category
-        for category_id in list(seen_files_tracker.keys()):
-            category_sessions = seen_files_tracker[category_id]
-            
-            # 1. Remove expired sessions (not accessed recently)
-            expired_sessions = [
-                session_id for session_id, data in category_sessions.items()
-                if current_time - data.get("last_access", 0) > session_expiry
-            ]
-            
-            for session_id in expired_sessions:
-                del category_sessions[session_id]
-                sessions_removed += 1
-            
-            # 2. Enforce maximum sessions per category by removing oldest
-            if len(category_sessions) > MAX_SESSIONS_PER_CATEGORY:
-                # Sort by last access time (oldest first)
-                sorted_sessions = sorted(
-                    category_sessions.items(),
-                    key=lambda item: item[1].get("last_access", 0)
-                )
-                # Remove oldest sessions to get back to the limit
-                sessions_to_remove = len(category_sessions) - MAX_SESSIONS_PER_CATEGORY
-                for session_id, _ in sorted_sessions[:sessions_to_remove]:
-                    del category_sessions[session_id]
-                    sessions_removed += 1
-            
-            # 3. Remove empty category entries
-            if not category_sessions:
-                del seen_files_tracker[category_id]
-                categories_cleaned += 1
+        Args:
+            app: The Flask application, used for the thread's app context.
+        """
+        global session_cleanup_thread
+        if session_cleanup_thread is not None:
+            return
+        
+        def cleanup_loop():
+            with app.app_context():
+                while True:
+                    time.sleep(SESSION_CLEANUP_INTERVAL)
+                    try:
+                        MediaService.clean_sessions()
+                    except Exception as e:
+                        logger.error(f"Error during session tracker cleanup: {e}")
+                        logger.debug(traceback.format_exc())
         
-        logger.info(f"Session cleanup complete: removed {sessions_removed} inactive sessions and {categories_cleaned} empty categories.")
-        last_session_cleanup = current_time
+        session_cleanup_thread = threading.Thread(target=cleanup_loop, daemon=True)
+        session_cleanup_thread.start()
+        logger.info("Started session tracker cleanup thread")
 
     @staticmethod
     def get_session_order(category_id, session_id):
@@ -288,37 +438,38 @@ class MediaService:
         Returns the order list if found, None otherwise.
         """
         global seen_files_tracker
-        if category_id in seen_files_tracker and session_id in seen_files_tracker[category_id]:
-            return seen_files_tracker[category_id][session_id].get('order')
-        return None
+        session_data = seen_files_tracker.get((category_id, session_id))
+        return session_data.order if session_data is not None else None
+
 
     @staticmethod
-    def list_media_files(category_id, page=1, limit=None, force_refresh=False, shuffle=True):
+    def list_media_files(category_id, page=1, limit=None, force_refresh=False, shuffle=True, preloaded_index=None):
         """
         Get paginated media files for a category with optional shuffling.
         
+        preloaded_index lets list_media_files_async hand over the index it has
+        just loaded, instead of having it loaded again.
+        
         Returns (media_list, pagination_info, error_message) tuple.
         """
-        from .sync_service import SyncService
-        MediaService.clean_sessions()
-
-        limit = limit or current_app.config['DEFAULT_PAGE_SIZE']
+        config = current_app.config
+        limit = limit or config['DEFAULT_PAGE_SIZE']
         if page < 1:
             return None, None, "Page number must be 1 or greater."
         if not (1 <= limit <= 100): # Example limit range
             return None, None, "Limit must be between 1 and 100."
 
-        category = CategoryService.get_category_by_id(category_id)
+        category = _cached_category(category_id)
         if not category:
             logger.warning(f"Category not found when listing media: {category_id}")
             return None, None, "Category not found."
 
         category_path = category['path']
         category_name = category['name']
-        cache_expiry = current_app.config.get('CACHE_EXPIRY', 300)
+        cache_expiry = config.get('CACHE_EXPIRY', 300)
 
         all_files_metadata = MediaService._load_or_rebuild_index(
-            category_path, category_name, category_id, force_refresh, cache_expiry
+            category_path, category_name, category_id, force_refresh, cache_expiry, preloaded_index
         )
 
         if all_files_metadata is None: # Error occurred in _load_or_rebuild_index
@@ -332,10 +483,10 @@ class MediaService:
         total_files_in_directory = len(all_files_metadata)
         logger.info(f"Total files indexed for '{category_name}': {total_files_in_directory}")
 
-        session_id = request.cookies.get('session_id')
-        if not session_id:
-            session_id = str(uuid.uuid4()) # Temporary ID if cookie not present
-            logger.warning("Session ID cookie not found, generated temporary ID for ordering.")
+        session_id = request.cookies.get('session_id') or None
+        if session_id is None:
+            # The next request could not find this session again, so it is not tracked
+            logger.warning("Session ID cookie not found, using an untracked order for this request.")
 
         files_to_paginate = MediaService._determine_file_order(
             all_files_metadata, category_id, session_id, shuffle, force_refresh, category_name
@@ -353,18 +504,16 @@ class MediaService:
         end_index = min(start_index + limit, len(files_to_paginate))
         paginated_filenames = files_to_paginate[start_index:end_index] if start_index < len(files_to_paginate) else []
 
-        # Mark files in the current page as seen (only if shuffling and not in active sync)
+        # Advance the seen cursor past the current page (only if shuffling and not in active sync)
         # The _determine_file_order handles sync_active_order, so if shuffle is true here, it's not overridden by active sync.
         if shuffle: 
-            session_data = seen_files_tracker.get(category_id, {}).get(session_id)
+            session_data = seen_files_tracker.get((category_id, session_id))
             if session_data:
-                for filename in paginated_filenames:
-                    session_data["seen"].add(filename)
+                session_data.cursor = max(session_data.cursor, end_index)
         
         # --- Prepare Response Data ---
-        all_files_metadata_lookup = {f_meta['name']: f_meta for f_meta in all_files_metadata}
         paginated_media_info = MediaService._prepare_paginated_response_data(
-            paginated_filenames, category_id, all_files_metadata_lookup
+            paginated_filenames, category_id, all_files_metadata
         )
 
         pagination_details = {
@@ -383,7 +532,7 @@ class MediaService:
         
         Returns (filepath, error_message) tuple.
         """
-        category = CategoryService.get_category_by_id(category_id)
+        category = _cached_category(category_id)
         if not category:
             return None, "Category not found."
 
@@ -410,26 +559,43 @@ class MediaService:
         # This is crucial if category['path'] could be manipulated
         # Realpath resolves symlinks, normpath cleans the path string
         try:
-            base_dir = os.path.realpath(category['path'])
-            target_file = os.path.realpath(full_path)
-            if not target_file.startswith(base_dir):
-                logger.error(f"Security Alert: Path traversal detected! Attempted access outside base directory. Base: '{base_dir}', Target: '{target_file}'")
-                return None, "Access denied."
+            base_dir = _real_base(category['path'])
+            file_stat = None
+            if os.path.basename(filename) == filename:
+                # A name directly in the category: one lstat() both rules out a
+                # symlink leading elsewhere and answers the existence/type checks
+                try:
+                    file_stat = os.lstat(full_path)
+                except OSError:
+                    logger.warning(f"Media file not found at path: {full_path}")
+                    return None, "File not found."
+            if file_stat is not None and not stat.S_ISLNK(file_stat.st_mode):
+                target_file = os.path.join(base_dir, filename)
+            else:
+                file_stat = None
+                target_file = os.path.realpath(full_path)
+                # commonpath compares whole components, so a sibling such as
+                # '<base>-other' does not pass as being inside the base
+                if os.path.commonpath([base_dir, target_file]) != base_dir:
+                    logger.error(f"Security Alert: Path traversal detected! Attempted access outside base directory. Base: '{base_dir}', Target: '{target_file}'")
+                    return None, "Access denied."
         except Exception as security_check_error:
              logger.error(f"Error during security path validation: {security_check_error}")
              return None, "File path validation failed."
 
 
-        # Final checks: existence and file type
-        if not os.path.exists(target_file):
-            logger.warning(f"Media file not found at path: {target_file}")
-            return None, "File not found."
-        if not os.path.isfile(target_file):
+        # Final checks: existence and file type, from a single stat
+        if file_stat is None:
+            try:
+                file_stat = os.stat(target_file)
+            except OSError:
+                logger.warning(f"Media file not found at path: {target_file}")
+                return None, "File not found."
+        if not stat.S_ISREG(file_stat.st_mode):
             logger.warning(f"Path exists but is not a file: {target_file}")
             return None, "Path is not a file."
-        if not os.access(target_file, os.R_OK):
-            logger.warning(f"File exists but is not readable: {target_file}")
-            return None, "File not readable."
+        # Readability is not pre-checked with os.access(); a permission problem
+        # surfaces (and is logged) when the file is actually opened for serving
 
         logger.info(f"Validated media file path: {target_file}")
         return target_file, None
@@ -479,8 +645,10 @@ class MediaService:
         
         Returns (media_list, pagination_info, error_message, is_async) tuple.
         """
+        config = current_app.config
+        
         # Get category info
-        category = CategoryService.get_category_by_id(category_id)
+        category = _cached_category(category_id)
         if not category:
             return None, None, "Category not found.", False
         
@@ -488,21 +656,27 @@ class MediaService:
         
         # First check if a valid index file already exists
         index_data = load_index(category_path)
-        cache_expiry = current_app.config.get('CACHE_EXPIRY', 300)
+        cache_expiry = config.get('CACHE_EXPIRY', 300)
         current_time = time.time()
         
         # Check if the index file is valid
-        has_valid_index = (index_data and 'timestamp' in index_data and 'files' in index_data and 
-                          current_time - index_data['timestamp'] <= cache_expiry)
+        has_valid_index = is_index_fresh(index_data, category_path, cache_expiry, current_time)
         
         # If we have a valid index file, use it directly without async indexing
         # Even if force_refresh is True, we can still use the index file and avoid async indexing
         if has_valid_index:
             logger.info(f"Using existing valid index file for '{category['name']}' without async indexing (force_refresh: {force_refresh})")
-            return MediaService.list_media_files(category_id, page, limit, force_refresh, shuffle) + (False,)
+            return MediaService.list_media_files(
+                category_id, page, limit, force_refresh, shuffle, preloaded_index=index_data
+            ) + (False,)
         
         # Check if this is a large directory that should use async indexing
-        if is_large_directory(category_path, IndexingService.LARGE_DIRECTORY_THRESHOLD):
+        # An expired index still tells how big the directory is
+        if index_data and 'files' in index_data:
+            is_large = len(index_data['files']) > IndexingService.LARGE_DIRECTORY_THRESHOLD
+        else:
+            is_large = is_large_directory(category_path, IndexingService.LARGE_DIRECTORY_THRESHOLD)
+        if is_large:
             logger.info(f"Large directory detected for '{category['name']}', using async indexing")
             
             # Check if async indexing is already in progress or complete
@@ -524,36 +698,23 @@ class MediaService:
                 return MediaService.list_media_files(category_id, page, limit, False, shuffle) + (False,)
             
             # If indexing is still running, return partial results if available
-            if status['files']:
-                # Create a partial response with available files
-                available_files = status['files']
+            if status['processed_files']:
+                # Create a partial response with available files; only rows the
+                # indexer has already filled are safe to read
+                available_files = status['files'][:status['processed_files']]
                 total_files = status['total_files'] or len(available_files)
                 
                 # Apply pagination to available files
-                limit = limit or current_app.config['DEFAULT_PAGE_SIZE']
+                limit = limit or config['DEFAULT_PAGE_SIZE']
                 start_index = (page - 1) * limit
                 end_index = min(start_index + limit, len(available_files))
                 
-                paginated_files = available_files[start_index:end_index] if start_index < len(available_files) else []
+                paginated_files = available_files[start_index:end_index] if start_index < len(available_files) else FileMetadataTable()
                 
                 # Convert to media info format
-                paginated_media_info = []
-                from urllib.parse import quote
-                
-                for file_meta in paginated_files:
-                    filename = file_meta['name']
-                    file_type = get_media_type(filename)
-                    info = {
-                        'name': filename,
-                        'type': file_type,
-                        'size': file_meta.get('size', 0),
-                        'url': f'/media/{category_id}/{quote(filename)}'
-                    }
-                    
-                    # Add thumbnail URL for video files
-                    if file_type == 'video':
-                        info['thumbnailUrl'] = get_thumbnail_url(category_id, filename)
-                    paginated_media_info.append(info)
+                paginated_media_info = MediaService._prepare_paginated_response_data(
+                    paginated_files.names, category_id, paginated_files
+                )
                 
                 # Create pagination details
                 pagination_details = {
@@ -570,7 +731,7 @@ class MediaService:
             # Set hasMore to True since indexing is still in progress
             pagination_details = {
                 'page': page,
-                'limit': limit or current_app.config['DEFAULT_PAGE_SIZE'],
+                'limit': limit or config['DEFAULT_PAGE_SIZE'],
                 'total': status['total_files'] or 0,
                 'hasMore': True,  # Always true while indexing is in progress
                 'indexing_progress': status['progress']
@@ -586,27 +747,30 @@ class MediaService:
     def clear_session_tracker(category_id=None, session_id=None):
         """Clear session tracking data for specified or all sessions/categories."""
         global seen_files_tracker, sync_mode_order
-        if category_id and session_id:
-            if category_id in seen_files_tracker and session_id in seen_files_tracker[category_id]:
-                del seen_files_tracker[category_id][session_id]
-                logger.info(f"Cleared tracker for session {session_id} in category {category_id}")
-        elif category_id:
-            # Clear trackers for the category
-            if category_id in seen_files_tracker:
-                del seen_files_tracker[category_id]
-                logger.info(f"Cleared tracker for all sessions in category {category_id}")
+        # Categories may have been removed or edited along with their trackers
+        clear_category_cache()
+        with session_tracker_lock:
+            if category_id and session_id:
+                if seen_files_tracker.pop((category_id, session_id), None) is not None:
+                    logger.info(f"Cleared tracker for session {session_id} in category {category_id}")
+            elif category_id:
+                # Clear trackers for the category
+                category_keys = [key for key in seen_files_tracker if key[0] == category_id]
+                for key in category_keys:
+                    del seen_files_tracker[key]
+                if category_keys:
+                    logger.info(f"Cleared tracker for all sessions in category {category_id}")
             
-            # Also clear sync mode order for the category
-            if category_id in sync_mode_order:
-                del sync_mode_order[category_id]
-                logger.info(f"Cleared sync mode order for category {category_id}")
-        elif session_id:
-            for cat_id in list(seen_files_tracker.keys()):
-                if session_id in seen_files_tracker[cat_id]:
-                    del seen_files_tracker[cat_id][session_id]
-            logger.info(f"Cleared tracker for session {session_id} across all categories")
-        else:
-            # Clear all trackers and sync mode orders
-            seen_files_tracker.clear()
-            sync_mode_order.clear()
-            logger.info("Cleared entire seen files tracker and sync mode orders.")
+                # Also clear sync mode order for the category
+                if category_id in sync_mode_order:
+                    del sync_mode_order[category_id]
+                    logger.info(f"Cleared sync mode order for category {category_id}")
+            elif session_id:
+                for key in [key for key in seen_files_tracker if key[1] == session_id]:
+                    del seen_files_tracker[key]
+                logger.info(f"Cleared tracker for session {session_id} across all categories")
+            else:
+                # Clear all trackers and sync mode orders
+                seen_files_tracker.clear()
+                sync_mode_order.clear()
+                logger.info("Cleared entire seen files tracker and sync mode orders.")
@@ -7,6 +7,8 @@ Provides caching mechanisms for media files to improve performance.
 
 import time
 import logging
+import threading
+from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
 
@@ -15,11 +17,12 @@ SMALL_FILE_THRESHOLD = 8 * 1024 * 1024  # 8MB
 
 # Cache of recently accessed files to speed up repeated access
 # Structure: {filepath: (last_access_time, file_data, file_size, mime_type, etag)}
-small_file_cache = {}
+# Both caches are kept in access order (oldest first) via move_to_end on every hit.
+small_file_cache = OrderedDict()
 
 # Cache of open file descriptors for large files
 # Structure: {filepath: (last_access_time, file_descriptor, file_size, mime_type, etag)}
-fd_cache = {}
+fd_cache = OrderedDict()
 
 # Maximum number of file descriptors to keep open
 MAX_FD_CACHE_SIZE = 30
@@ -27,37 +30,39 @@ MAX_FD_CACHE_SIZE = 30
 # Cache expiry time in seconds
 CACHE_EXPIRY = 600  # 10 minutes
 
+# Guards both caches; the stream routes and clean_caches may run on different threads
+_cache_lock = threading.RLock()
+
+def _close_cached_fd(filepath, file_obj):
+    """Close a file object evicted from the FD cache."""
+    try:
+        file_obj.close()
+    except Exception as e:
+        logger.warning(f"Error closing cached file descriptor for {filepath}: {e}")
+
 def clean_caches():
     """Remove expired entries from file caches to prevent memory leaks."""
-    current_time = time.time()
-    
-    # Clean small file cache
-    expired_keys = [k for k, (access_time, _, _, _, _) in small_file_cache.items() 
-                   if current_time - access_time > CACHE_EXPIRY]
-    for k in expired_keys:
-        del small_file_cache[k]
+    expiry_cutoff = time.time() - CACHE_EXPIRY
     
-    # Clean file descriptor cache
-    expired_fd_keys = [k for k, (access_time, fd, _, _, _) in fd_cache.items() 
-                      if current_time - access_time > CACHE_EXPIRY]
-    for k in expired_fd_keys:
-        try:
-            fd_cache[k][1].close()  # Close the file descriptor
-        except Exception as e:
-            logger.warning(f"Error closing cached file descriptor for {k}: {e}")
-        del fd_cache[k]
-    
-    # If FD cache is still too large, close the least recently used ones
-    if len(fd_cache) > MAX_FD_CACHE_SIZE:
-        # Sort by access time (oldest first)
-        sorted_items = sorted(fd_cache.items(), key=lambda x: x[1][0])
-        # Close oldest file descriptors until we're under the limit
-        for k, (_, fd, _, _, _) in sorted_items[:len(fd_cache) - MAX_FD_CACHE_SIZE]:
-            try:
-                fd.close()
-            except Exception as e:
-                logger.warning(f"Error closing cached file descriptor for {k}: {e}")
-            del fd_cache[k]
+    with _cache_lock:
+        # Caches are in access order, so expired entries are all at the front
+        while small_file_cache:
+            filepath, entry = next(iter(small_file_cache.items()))
+            if entry[0] >= expiry_cutoff:
+                break
+            del small_file_cache[filepath]
+        
+        while fd_cache:
+            filepath, entry = next(iter(fd_cache.items()))
+            if entry[0] >= expiry_cutoff:
+                break
+            del fd_cache[filepath]
+            _close_cached_fd(filepath, entry[1])
+        
+        # If FD cache is still too large, close the least recently used ones
+        while len(fd_cache) > MAX_FD_CACHE_SIZE:
+            filepath, entry = fd_cache.popitem(last=False)
+            _close_cached_fd(filepath, entry[1])
 
 def get_from_small_cache(filepath):
     """
@@ -69,13 +74,16 @@ def get_from_small_cache(filepath):
     Returns:
         Tuple of (file_data, file_size, mime_type, etag) or None if not in cache
     """
-    if filepath in small_file_cache:
-        access_time, file_data, file_size, mime_type, etag = small_file_cache[filepath]
+    with _cache_lock:
+        entry = small_file_cache.get(filepath)
+        if entry is None:
+            return None
+        access_time, file_data, file_size, mime_type, etag = entry
         # Update access time
         small_file_cache[filepath] = (time.time(), file_data, file_size, mime_type, etag)
-        logger.info(f"Serving small file from cache: {filepath}")
-        return file_data, file_size, mime_type, etag
-    return None
+        small_file_cache.move_to_end(filepath)
+    logger.info(f"Serving small file from cache: {filepath}")
+    return file_data, file_size, mime_type, etag
 
 def add_to_small_cache(filepath, file_data, file_size, mime_type, etag):
     """
@@ -88,7 +96,9 @@ def add_to_small_cache(filepath, file_data, file_size, mime_type, etag):
         mime_type: MIME type of the file
         etag: ETag for the file
     """
-    small_file_cache[filepath] = (time.time(), file_data, file_size, mime_type, etag)
+    with _cache_lock:
+        small_file_cache[filepath] = (time.time(), file_data, file_size, mime_type, etag)
+        small_file_cache.move_to_end(filepath)
     logger.info(f"Loaded small file into cache: {filepath} ({file_size} bytes)")
 
 def get_from_fd_cache(filepath):
@@ -101,23 +111,25 @@ def get_from_fd_cache(filepath):
     Returns:
         Tuple of (file_descriptor, file_size, mime_type, etag) or None if not in cache
     """
-    if filepath in fd_cache:
-        access_time, file_obj, file_size, mime_type, etag = fd_cache[filepath]
-        # Update access time
-        fd_cache[filepath] = (time.time(), file_obj, file_size, mime_type, etag)
-        # Seek to beginning of file
-        try:
-            file_obj.seek(0)
-            logger.info(f"Using cached file descriptor for: {filepath}")
-            return file_obj, file_size, mime_type, etag
-        except Exception as e:
-            logger.warning(f"Error seeking cached file descriptor for {filepath}: {e}")
-            # Close and remove from cache if seeking fails
+    with _cache_lock:
+        if filepath in fd_cache:
+            access_time, file_obj, file_size, mime_type, etag = fd_cache[filepath]
+            # Update access time
+            fd_cache[filepath] = (time.time(), file_obj, file_size, mime_type, etag)
+            fd_cache.move_to_end(filepath)
+            # Seek to beginning of file
             try:
-                file_obj.close()
-            except:
-                pass
-            del fd_cache[filepath]
+                file_obj.seek(0)
+                logger.info(f"Using cached file descriptor for: {filepath}")
+                return file_obj, file_size, mime_type, etag
+            except Exception as e:
+                logger.warning(f"Error seeking cached file descriptor for {filepath}: {e}")
+                # Close and remove from cache if seeking fails
+                try:
+                    file_obj.close()
+                except:
+                    pass
+                del fd_cache[filepath]
     return None
 
 def add_to_fd_cache(filepath, file_obj, file_size, mime_type, etag):
@@ -131,9 +143,13 @@ def add_to_fd_cache(filepath, file_obj, file_size, mime_type, etag):
         mime_type: MIME type of the file
         etag: ETag for the file
     """
-    # If cache is full, clean it first
-    if len(fd_cache) >= MAX_FD_CACHE_SIZE:
-        clean_caches()
+    with _cache_lock:
+        fd_cache[filepath] = (time.time(), file_obj, file_size, mime_type, etag)
+        fd_cache.move_to_end(filepath)
+        
+        # Evict least recently used descriptors once over capacity
+        while len(fd_cache) > MAX_FD_CACHE_SIZE:
+            evicted_path, entry = fd_cache.popitem(last=False)
+            _close_cached_fd(evicted_path, entry[1])
     
-    fd_cache[filepath] = (time.time(), file_obj, file_size, mime_type, etag)
     logger.info(f"Cached file descriptor for: {filepath}")
@@ -5,17 +5,159 @@ Utilities for managing category configuration files.
 """
 # app/utils/file_utils.py
 import os
+import sys
 import json
 import time
 import logging
+import threading
 import traceback
+from array import array
+from contextlib import contextmanager
 from flask import current_app
+from app.utils import statx
 
 logger = logging.getLogger(__name__)
 
+# Optional dependencies
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+    logger.info("orjson not installed - using stdlib json for category indexes")
+
 INDEX_FILENAME = "ghosthub.json"
 GHOSTHUB_DIR_NAME = ".ghosthub"
 
+# Directory mtime validation of indexes
+DIR_MTIME_GRANULARITY = 2  # Seconds; FAT/exFAT media drives store mtimes in 2s steps
+DIR_MTIME_MAX_AGE_FACTOR = 12  # An unchanged dir mtime keeps an index fresh for at most this many CACHE_EXPIRY periods
+
+# Parsed index files: {filepath: ((mtime_ns, size), index_data)}
+# An entry is only reused while the file on disk still has the same mtime and size.
+_index_cache = {}
+_index_cache_lock = threading.Lock()
+
+class FileMetadataTable:
+    """
+    Struct-of-arrays storage for the files of a category index.
+    
+    Names, sizes and mtimes live in three parallel sequences instead of one
+    dict per file. For compatibility the table still behaves like a read-only
+    list of {'name', 'size', 'mtime'} dicts: indexing and iteration build
+    those dicts on the fly, and slicing returns a new table.
+    
+    Names are interned, so the same filename held by successive index
+    loads, session orders and the sync order is a single string object.
+    
+    On disk it is stored as {'names': [...], 'sizes': [...], 'mtimes': [...]}.
+    """
+    __slots__ = ('names', 'sizes', 'mtimes', '_derived')
+    
+    def __init__(self, names=None, sizes=None, mtimes=None):
+        self.names = names if names is not None else []
+        self.sizes = sizes if sizes is not None else array('Q')
+        self.mtimes = mtimes if mtimes is not None else array('d')
+        self._derived = {}
+    
+    @classmethod
+    def with_capacity(cls, capacity):
+        """Create a table presized to capacity rows, to be filled with set()."""
+        return cls([None] * capacity, array('Q', bytes(8 * capacity)), array('d', bytes(8 * capacity)))
+    
+    @classmethod
+    def from_json(cls, files):
+        """Build a table from the stored column layout or a legacy list of dicts."""
+        if isinstance(files, dict):
+            return cls(list(map(sys.intern, files['names'])), array('Q', files['sizes']), array('d', files['mtimes']))
+        table = cls()
+        for file_meta in files:
+            table.append(file_meta['name'], file_meta.get('size', 0), file_meta.get('mtime', 0))
+        return table
+    
+    def to_json(self):
+        """Return the column layout used for the index file."""
+        return {'names': self.names, 'sizes': self.sizes.tolist(), 'mtimes': self.mtimes.tolist()}
+    
+    def derived_column(self, key, func):
+        """
+        Return [func(name) for every row], cached on the table under key.
+        
+        Indexes are memoized by load_index, so per-file values that depend
+        only on the filename are computed once per index instead of once
+        per request. The column is rebuilt if the row count has changed.
+        """
+        column = self._derived.get(key)
+        if column is None or len(column) != len(self.names):
+            column = list(map(func, self.names))
+            self._derived[key] = column
+        return column
+    
+    def row_lookup(self):
+        """
+        Return {name: row} for the table, cached like the derived columns.
+        
+        Pages are served by name, so this lets a request find its rows in
+        O(page size) instead of indexing every file again.
+        """
+        cached = self._derived.get('__rows__')
+        if cached is None or cached[0] != len(self.names):
+            cached = (len(self.names), {name: row for row, name in enumerate(self.names)})
+            self._derived['__rows__'] = cached
+        return cached[1]
+    
+    def append(self, name, size, mtime):
+        self.names.append(sys.intern(name))
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+    
+    def set(self, position, name, size, mtime):
+        """Fill row position, appending when it is one past the end."""
+        if position < len(self.names):
+            self.names[position] = sys.intern(name)
+            self.sizes[position] = size
+            self.mtimes[position] = mtime
+        else:
+            self.append(name, size, mtime)
+    
+    def sort_by_name(self):
+        """
+        Reorder all rows by filename, in place.
+        
+        Tables are kept name-sorted so the sorted (sync) order can reuse the
+        names column directly. Sorting an already sorted table is linear.
+        """
+        names = self.names
+        order = sorted(range(len(names)), key=names.__getitem__)
+        self.names = [names[i] for i in order]
+        self.sizes = array('Q', [self.sizes[i] for i in order])
+        self.mtimes = array('d', [self.mtimes[i] for i in order])
+        self._derived = {}
+    
+    def truncate(self, length):
+        """Drop every row from length onwards."""
+        del self.names[length:]
+        del self.sizes[length:]
+        del self.mtimes[length:]
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return FileMetadataTable(self.names[key], self.sizes[key], self.mtimes[key])
+        return {'name': self.names[key], 'size': self.sizes[key], 'mtime': self.mtimes[key]}
+    
+    def __iter__(self):
+        for name, size, mtime in zip(self.names, self.sizes, self.mtimes):
+            yield {'name': name, 'size': size, 'mtime': mtime}
+
+def _index_default(obj):
+    """JSON fallback hook so FileMetadataTable serializes in its column layout."""
+    if isinstance(obj, FileMetadataTable):
+        return obj.to_json()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
 def get_categories_filepath():
     """Get absolute path to the categories JSON file."""
     # Use instance_path which is correctly set by the app factory
@@ -91,29 +233,127 @@ def backup_corrupted_file(filepath):
         except Exception as e:
             logger.error(f"Failed to backup corrupted file {filepath}: {str(e)}")
 
+def _encode_index(index_data):
+    """Serialize index data to compact UTF-8 JSON bytes."""
+    if HAS_ORJSON:
+        return orjson.dumps(index_data, default=_index_default)
+    return json.dumps(index_data, separators=(',', ':'), default=_index_default).encode('utf-8')
+
+def _decode_index(payload):
+    """
+    Parse index JSON bytes, turning the files entry into a FileMetadataTable.
+    Raises json.JSONDecodeError on invalid input.
+    """
+    if HAS_ORJSON:
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        index_data = orjson.loads(payload)
+    else:
+        index_data = json.loads(payload)
+    if isinstance(index_data, dict) and 'files' in index_data:
+        files = FileMetadataTable.from_json(index_data['files'])
+        files.sort_by_name()
+        index_data['files'] = files
+    return index_data
+
 def get_index_filepath(category_path):
     """Get the absolute path to the index file for a given category path."""
-    ghosthub_dir = os.path.join(category_path, GHOSTHUB_DIR_NAME)
-    os.makedirs(ghosthub_dir, exist_ok=True)
-    return os.path.join(ghosthub_dir, INDEX_FILENAME)
+    return os.path.join(category_path, GHOSTHUB_DIR_NAME, INDEX_FILENAME)
+
+def ensure_ghosthub_dir(category_path):
+    """
+    Create the category's .ghosthub directory if needed, before writing into it.
+
+    Index builds call this before reading the directory mtime, since creating
+    .ghosthub changes the category's own mtime.
+
+    Returns:
+        bool: True if the directory exists, False if it could not be created.
+    """
+    try:
+        os.makedirs(os.path.join(category_path, GHOSTHUB_DIR_NAME), exist_ok=True)
+        return True
+    except OSError as e:
+        logger.warning(f"Could not create {GHOSTHUB_DIR_NAME} in {category_path}: {e}")
+        return False
+
+def get_directory_mtime(category_path):
+    """
+    Get the category directory's mtime in nanoseconds, or None if it cannot be read.
+
+    Adding, removing or renaming a file in the directory changes its mtime.
+    The index and thumbnails live under .ghosthub, so writing them only
+    changes the category's own mtime when .ghosthub is first created.
+
+    An mtime within DIR_MTIME_GRANULARITY of now is also reported as None:
+    a further change in the same timestamp step would leave it unchanged,
+    so it cannot vouch for an index yet.
+    """
+    try:
+        mtime_ns = os.stat(category_path).st_mtime_ns
+    except OSError:
+        return None
+    if time.time() - mtime_ns / 1e9 < DIR_MTIME_GRANULARITY:
+        return None
+    return mtime_ns
+
+def is_index_fresh(index_data, category_path, cache_expiry, current_time=None):
+    """
+    Check whether a loaded index can be used without rescanning the directory.
+
+    An index is fresh if it is younger than cache_expiry seconds, or if the
+    directory's mtime still matches the one recorded when it was built
+    (nothing was added, removed or renamed since). The mtime match only
+    holds for DIR_MTIME_MAX_AGE_FACTOR expiry periods, so files edited in
+    place are still picked up eventually.
+
+    Returns:
+        bool: True if the index is usable as is.
+    """
+    if not index_data or 'timestamp' not in index_data or 'files' not in index_data:
+        return False
+    if current_time is None:
+        current_time = time.time()
+    age = current_time - index_data['timestamp']
+    if age <= cache_expiry:
+        return True
+    dir_mtime = index_data.get('dir_mtime')
+    return (dir_mtime is not None and age <= cache_expiry * DIR_MTIME_MAX_AGE_FACTOR
+            and dir_mtime == get_directory_mtime(category_path))
 
 def load_index(category_path):
     """
     Load the media index from the JSON file for a category.
 
+    Parsed indexes are kept in memory and reused as long as the file's
+    mtime and size are unchanged, so repeat loads cost a single stat().
+
     Returns:
         dict: The loaded index data (including timestamp and files) or None on error.
     """
     filepath = get_index_filepath(category_path)
     try:
-        if not os.path.exists(filepath):
+        try:
+            stats = os.stat(filepath)
+        except FileNotFoundError:
+            with _index_cache_lock:
+                _index_cache.pop(filepath, None)
             logger.info(f"Index file not found: {filepath}")
             return None
-        with open(filepath, 'r') as f:
-            index_data = json.load(f)
-            file_count = len(index_data.get('files', []))
-            logger.info(f"Successfully loaded index from {filepath} with {file_count} files")
-            return index_data
+
+        version = (stats.st_mtime_ns, stats.st_size)
+        with _index_cache_lock:
+            cached = _index_cache.get(filepath)
+        if cached and cached[0] == version:
+            logger.debug(f"Using cached index for {filepath}")
+            return cached[1]
+
+        with open(filepath, 'rb') as f:
+            index_data = _decode_index(f.read())
+        with _index_cache_lock:
+            _index_cache[filepath] = (version, index_data)
+        file_count = len(index_data.get('files', []))
+        logger.info(f"Successfully loaded index from {filepath} with {file_count} files")
+        return index_data
     except json.JSONDecodeError:
         logger.error(f"Invalid JSON in index file: {filepath}. Backing up and treating as missing.")
         backup_corrupted_file(filepath)
@@ -129,7 +369,7 @@ def save_index(category_path, index_data):
 
     Args:
         category_path (str): The path to the category directory.
-        index_data (dict): The index data to save (should include timestamp and files list).
+        index_data (dict): The index data to save (should include timestamp and a FileMetadataTable of files).
 
     Returns:
         bool: True if successful, False otherwise.
@@ -138,28 +378,73 @@ def save_index(category_path, index_data):
     filepath = get_index_filepath(category_path)
     
     try:
+        ensure_ghosthub_dir(category_path)
         file_count = len(index_data.get('files', []))
         
         # Log more details about the file we're trying to save
         logger.info(f"Attempting to save index directly to {filepath} with {file_count} files")
         
-        # Write the file with explicit encoding - use a simpler approach
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(index_data, f)
+        # Encode once, write to a temporary file and swap it in atomically so
+        # concurrent readers never observe a partially written index
+        payload = _encode_index(index_data)
+        temp_filepath = f"{filepath}.tmp"
+        with open(temp_filepath, 'wb') as f:
+            f.write(payload)
+        os.replace(temp_filepath, filepath)
         
-        # Verify the file was created
-        if os.path.exists(filepath):
-            file_size = os.path.getsize(filepath)
-            logger.info(f"Successfully saved index to {filepath} with {file_count} files (size: {file_size} bytes)")
-            return True
-        else:
-            logger.error(f"File was not created: {filepath}")
-            return False
+        stats = os.stat(filepath)
+        file_size = stats.st_size
+        # Remember what was just written so the next load_index skips re-parsing it
+        with _index_cache_lock:
+            _index_cache[filepath] = ((stats.st_mtime_ns, file_size), index_data)
+        logger.info(f"Successfully saved index to {filepath} with {file_count} files (size: {file_size} bytes)")
+        return True
     except Exception as e:
         logger.error(f"Error saving index to {filepath}: {str(e)}")
         logger.debug(traceback.format_exc())
         return False
 
+def _stat_dir_entry(entry):
+    """Return (st_mode, st_size, st_mtime) for a directory entry, following symlinks."""
+    stats = entry.stat()
+    return stats.st_mode, stats.st_size, stats.st_mtime
+
+@contextmanager
+def scan_directory(directory_path):
+    """
+    Iterate over a directory's entries with os.scandir.
+
+    Where the platform supports it (Linux, macOS), the scan runs on an open
+    directory descriptor so that DirEntry.stat() resolves each name with a
+    single fstatat() relative to it, instead of walking the full category
+    path again for every file. Elsewhere this is a plain os.scandir.
+
+    With STATX_DONT_SYNC enabled on Linux, entries are stat()ed with
+    statx(AT_STATX_DONT_SYNC) instead, so network mounts answer from the
+    attribute cache rather than revalidating every file with the server.
+
+    Yields:
+        tuple: (entries, stat_entry) where entries iterates os.DirEntry objects
+        and stat_entry(entry) returns (st_mode, st_size, st_mtime) for one of them.
+    """
+    if os.scandir not in os.supports_fd:
+        with os.scandir(directory_path) as entries:
+            yield entries, _stat_dir_entry
+        return
+
+    dir_fd = os.open(directory_path, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+    try:
+        stat_entry = _stat_dir_entry
+        if statx.HAS_STATX and current_app.config.get('STATX_DONT_SYNC', False):
+            def stat_entry(entry):
+                result = statx.fast_stat(dir_fd, entry.name) if statx.HAS_STATX else None
+                return result if result is not None else _stat_dir_entry(entry)
+        
+        with os.scandir(dir_fd) as entries:
+            yield entries, stat_entry
+    finally:
+        os.close(dir_fd)
+
 def is_large_directory(category_path, threshold=50):
     """
     Check if a directory contains more than the threshold number of media files.
@@ -182,15 +467,22 @@ def is_large_directory(category_path, threshold=50):
         
         # If no valid index, count files directly
         # Import here to avoid circular import
-        from app.utils.media_utils import is_media_file
+        from app.utils.media_utils import media_extensions
         
         try:
-            # First try a simple directory listing
-            files = os.listdir(category_path)
-            media_files = [f for f in files if is_media_file(f)]
-            file_count = len(media_files)
+            # Count media names only until the answer is known
+            media_exts = media_extensions()
+            splitext = os.path.splitext
+            file_count = 0
+            with os.scandir(category_path) as entries:
+                for entry in entries:
+                    if splitext(entry.name)[1].lower() in media_exts:
+                        file_count += 1
+                        if file_count > threshold:
+                            logger.debug(f"Found more than {threshold} media files in {category_path}")
+                            return True
             logger.debug(f"Found {file_count} media files in {category_path}")
-            return file_count > threshold
+            return False
         except Exception as list_error:
             logger.error(f"Error listing directory {category_path}: {list_error}")
             return False
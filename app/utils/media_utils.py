@@ -7,9 +7,11 @@ Utilities for media file handling, type detection, and thumbnail generation.
 import os
 import logging
 import traceback
+from functools import lru_cache
 from flask import current_app
 from PIL import Image
 from urllib.parse import quote
+from app.utils.system_utils import native_thread_pool
 import threading # Use standard threading instead of eventlet
 
 logger = logging.getLogger(__name__)
@@ -24,22 +26,38 @@ except ImportError:
     OPENCV_AVAILABLE = False
     logger.warning("OpenCV is not available. Video thumbnail generation will be disabled.")
 
+@lru_cache(maxsize=8)
+def _media_extension_set(extensions):
+    return frozenset(extensions)
+
+def media_extensions():
+    """
+    Frozenset of the configured media extensions (lowercase, with dot).
+    
+    Directory scans look this up once and test
+    os.path.splitext(name)[1].lower() against it inline, instead of calling
+    is_media_file for every entry.
+    """
+    return _media_extension_set(tuple(current_app.config['MEDIA_EXTENSIONS']))
+
 def is_media_file(filename):
     """Check if a file has a supported media extension."""
     _, ext = os.path.splitext(filename)
-    return ext.lower() in current_app.config['MEDIA_EXTENSIONS']
+    return ext.lower() in media_extensions()
+
+@lru_cache(maxsize=8)
+def _media_type_map(image_extensions, video_extensions):
+    """Map each configured extension to its media type; image wins if listed in both."""
+    media_types = dict.fromkeys(video_extensions, 'video')
+    media_types.update(dict.fromkeys(image_extensions, 'image'))
+    return media_types
 
 def get_media_type(filename):
     """Determine if a file is an image, video, or unknown type."""
     _, ext = os.path.splitext(filename)
-    ext_lower = ext.lower()
-
-    if ext_lower in current_app.config['IMAGE_EXTENSIONS']:
-        return 'image'
-    elif ext_lower in current_app.config['VIDEO_EXTENSIONS']:
-        return 'video'
-    else:
-        return 'unknown'
+    config = current_app.config
+    media_types = _media_type_map(tuple(config['IMAGE_EXTENSIONS']), tuple(config['VIDEO_EXTENSIONS']))
+    return media_types.get(ext.lower(), 'unknown')
 
 def get_mime_type(filename):
     """Get the MIME type for a file based on its extension."""
@@ -60,6 +78,7 @@ THUMBNAIL_DIR_NAME = "thumbnails"
 GHOSTHUB_DIR_NAME = ".ghosthub"
 THUMBNAIL_SIZE = (256, 256)
 THUMBNAIL_FORMAT = "JPEG" # Use JPEG for good compression/quality balance
+THUMBNAIL_WORKERS = min(4, os.cpu_count() or 1)  # Parallel thumbnail generations per category
 
 def generate_thumbnail(original_media_path, thumbnail_save_path, size=THUMBNAIL_SIZE):
     """
@@ -203,6 +222,33 @@ def get_thumbnail_url(category_id, original_filename):
     encoded_thumbnail_filename = quote(thumbnail_filename)
     return f"/thumbnails/{category_id}/{encoded_thumbnail_filename}"
 
+def _generate_thumbnails(thumbnail_jobs):
+    """
+    Generate thumbnails for (original_path, thumbnail_path) pairs.
+    
+    Decoding and resizing in OpenCV/Pillow release the GIL, so a small pool
+    of native threads overlaps the work without the pickling constraints of
+    a process pool.
+    
+    Returns:
+        int: Number of thumbnails successfully generated.
+    """
+    if not thumbnail_jobs:
+        return 0
+    if len(thumbnail_jobs) == 1:
+        return 1 if generate_thumbnail(*thumbnail_jobs[0]) else 0
+    
+    app = current_app._get_current_object()
+    
+    # Workers do not inherit the app context (and gevent's native pool has no
+    # initializer), so each job enters it; this is cheap next to decoding
+    def generate_in_app_context(job):
+        with app.app_context():
+            return generate_thumbnail(*job)
+    
+    with native_thread_pool(min(THUMBNAIL_WORKERS, len(thumbnail_jobs))) as executor:
+        return sum(1 for generated in executor.map(generate_in_app_context, thumbnail_jobs) if generated)
+
 def process_category_thumbnails(category_path, all_files_metadata, force_refresh=False):
     """
     Process thumbnails for a category based on its content.
@@ -217,7 +263,7 @@ def process_category_thumbnails(category_path, all_files_metadata, force_refresh
     
     Args:
         category_path (str): Path to the category directory.
-        all_files_metadata (list): List of file metadata dictionaries.
+        all_files_metadata (FileMetadataTable): Indexed file metadata for the category.
         force_refresh (bool): Whether to force regeneration of existing thumbnails.
         
     Returns:
@@ -241,8 +287,7 @@ def process_category_thumbnails(category_path, all_files_metadata, force_refresh
     image_files = []
     video_files = []
     
-    for file_meta in all_files_metadata:
-        filename = file_meta['name']
+    for filename in all_files_metadata.names:
         file_type = get_media_type(filename)
         
         if file_type == 'image':
@@ -261,37 +306,39 @@ def process_category_thumbnails(category_path, all_files_metadata, force_refresh
     is_image_heavy = (image_count > 0) and (image_count / total_files > 0.9)
     logger.info(f"Category {category_path} has {image_count} images, {video_count} videos. Image-heavy: {is_image_heavy}")
     
-    thumbnails_generated = 0
+    # (original_path, thumbnail_path) pairs that need generating
+    thumbnail_jobs = []
+    
+    # Build per-file paths from precomputed prefixes, and read the existing
+    # thumbnails with one directory listing instead of an exists() per file
+    original_prefix = os.path.join(category_path, '')
+    thumbnail_prefix = os.path.join(thumbnail_dir, '')
+    thumbnail_suffix = '.' + THUMBNAIL_FORMAT.lower()
+    existing_thumbnails = set() if force_refresh else set(os.listdir(thumbnail_dir))
     
     # Always generate thumbnails for all videos
     for video_filename in video_files:
-        original_file_path = os.path.join(category_path, video_filename)
-        thumbnail_filename = video_filename + '.' + THUMBNAIL_FORMAT.lower()
-        thumbnail_save_path = os.path.join(thumbnail_dir, thumbnail_filename)
+        thumbnail_filename = video_filename + thumbnail_suffix
         
         # Check if thumbnail exists or needs refresh
-        if not os.path.exists(thumbnail_save_path) or force_refresh:
+        if thumbnail_filename not in existing_thumbnails:
             logger.info(f"Generating thumbnail for video: {video_filename}")
-            if generate_thumbnail(original_file_path, thumbnail_save_path):
-                thumbnails_generated += 1
+            thumbnail_jobs.append((original_prefix + video_filename, thumbnail_prefix + thumbnail_filename))
     
     # For image-heavy categories, generate only one image thumbnail (for category preview)
     # For video-heavy categories, still generate one image thumbnail if available
     if image_files:
-        # Sort image files for consistency
-        image_files.sort()
-        
-        # Use the first image as the category preview
+        # Index tables are sorted by name, so image_files already is too;
+        # use the first image as the category preview
         preview_image = image_files[0]
-        original_file_path = os.path.join(category_path, preview_image)
-        thumbnail_filename = preview_image + '.' + THUMBNAIL_FORMAT.lower()
-        thumbnail_save_path = os.path.join(thumbnail_dir, thumbnail_filename)
+        thumbnail_filename = preview_image + thumbnail_suffix
         
         # Check if thumbnail exists or needs refresh
-        if not os.path.exists(thumbnail_save_path) or force_refresh:
+        if thumbnail_filename not in existing_thumbnails:
             logger.info(f"Generating thumbnail for category preview image: {preview_image}")
-            if generate_thumbnail(original_file_path, thumbnail_save_path):
-                thumbnails_generated += 1
+            thumbnail_jobs.append((original_prefix + preview_image, thumbnail_prefix + thumbnail_filename))
+    
+    thumbnails_generated = _generate_thumbnails(thumbnail_jobs)
     
     logger.info(f"Processed thumbnails for {category_path}: {thumbnails_generated} generated/updated")
     return image_count, video_count, thumbnails_generated
@@ -328,7 +375,9 @@ def find_thumbnail(category_path, category_id, category_name):
             logger.error(f"Error listing directory {category_path} for thumbnail: {str(e)}")
             return 0, None, False # Return 3 values
 
-        media_files = [f for f in files if is_media_file(f)]
+        media_exts = media_extensions()
+        splitext = os.path.splitext
+        media_files = [f for f in files if splitext(f)[1].lower() in media_exts]
         media_count = len(media_files)
 
         if not media_files:
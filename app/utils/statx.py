@@ -0,0 +1,95 @@
+"""
+statx Support
+-------------
+Linux statx(2) binding used when stat-ing media files during index builds.
+"""
+# app/utils/statx.py
+
+import os
+import sys
+import errno
+import ctypes
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Constants from <linux/fcntl.h> and <linux/stat.h>
+AT_STATX_DONT_SYNC = 0x4000  # Serve attributes from the kernel cache, no remote revalidation
+STATX_TYPE = 0x0001
+STATX_MODE = 0x0002
+STATX_MTIME = 0x0040
+STATX_SIZE = 0x0200
+
+# Only the fields the index stores, plus the file type for the regular-file check
+STATX_INDEX_MASK = STATX_TYPE | STATX_MODE | STATX_MTIME | STATX_SIZE
+
+class _StatxTimestamp(ctypes.Structure):
+    _fields_ = [
+        ('tv_sec', ctypes.c_int64),
+        ('tv_nsec', ctypes.c_uint32),
+        ('_reserved', ctypes.c_int32),
+    ]
+
+class _Statx(ctypes.Structure):
+    """Mirror of struct statx; the trailing bytes are reserved for newer kernels."""
+    _fields_ = [
+        ('stx_mask', ctypes.c_uint32),
+        ('stx_blksize', ctypes.c_uint32),
+        ('stx_attributes', ctypes.c_uint64),
+        ('stx_nlink', ctypes.c_uint32),
+        ('stx_uid', ctypes.c_uint32),
+        ('stx_gid', ctypes.c_uint32),
+        ('stx_mode', ctypes.c_uint16),
+        ('_spare0', ctypes.c_uint16),
+        ('stx_ino', ctypes.c_uint64),
+        ('stx_size', ctypes.c_uint64),
+        ('stx_blocks', ctypes.c_uint64),
+        ('stx_attributes_mask', ctypes.c_uint64),
+        ('stx_atime', _StatxTimestamp),
+        ('stx_btime', _StatxTimestamp),
+        ('stx_ctime', _StatxTimestamp),
+        ('stx_mtime', _StatxTimestamp),
+        ('_spare', ctypes.c_uint8 * 128),
+    ]
+
+_statx = None
+if sys.platform.startswith('linux'):
+    try:
+        _statx = ctypes.CDLL(None, use_errno=True).statx
+        _statx.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_uint, ctypes.POINTER(_Statx)]
+        _statx.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        # glibc < 2.28, musl without the wrapper, etc.
+        _statx = None
+
+# Cleared at runtime if the kernel turns out to predate statx (< 4.11)
+HAS_STATX = _statx is not None
+
+def fast_stat(dir_fd, name):
+    """
+    Stat a file relative to an open directory with statx(AT_STATX_DONT_SYNC).
+
+    Symlinks are followed, as with DirEntry.stat().
+
+    Args:
+        dir_fd (int): Descriptor of the directory containing the file.
+        name (str): File name within that directory.
+
+    Returns:
+        tuple: (st_mode, st_size, st_mtime), or None if statx is unavailable.
+
+    Raises:
+        OSError: If the file cannot be stat()ed.
+    """
+    global HAS_STATX
+    buf = _Statx()
+    if _statx(dir_fd, os.fsencode(name), AT_STATX_DONT_SYNC, STATX_INDEX_MASK, ctypes.byref(buf)) != 0:
+        err = ctypes.get_errno()
+        if err == errno.ENOSYS:
+            logger.info("statx is not supported by this kernel, falling back to stat")
+            HAS_STATX = False
+            return None
+        raise OSError(err, os.strerror(err), name)
+    mtime = buf.stx_mtime
+    # Same float conversion as os.stat_result.st_mtime
+    return buf.stx_mode, buf.stx_size, mtime.tv_sec + mtime.tv_nsec * 1e-9
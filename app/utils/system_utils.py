@@ -6,9 +6,37 @@ Utilities for system-level operations and network functions.
 # app/utils/system_utils.py
 import socket
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# gevent's executor runs work on native threads even after monkey patching
+try:
+    from gevent import monkey as gevent_monkey
+    from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+    HAS_GEVENT = True
+except ImportError:
+    HAS_GEVENT = False
+
+def native_thread_pool(max_workers):
+    """
+    Create a thread pool whose workers are real OS threads.
+    
+    Once gevent has monkey-patched threading, concurrent.futures workers
+    are greenlets and blocking calls such as stat() or image decoding run
+    one at a time; gevent's own executor is used instead in that case.
+    Worker initializers are not supported.
+    
+    Args:
+        max_workers (int): Maximum number of worker threads.
+        
+    Returns:
+        concurrent.futures.ThreadPoolExecutor: The executor.
+    """
+    if HAS_GEVENT and gevent_monkey.is_module_patched('threading'):
+        return NativeThreadPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers)
+
 def get_local_ip():
     """
     Get machine's local IP address with fallback mechanisms.
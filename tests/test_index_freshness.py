@@ -0,0 +1,69 @@
+"""
+Tests for deciding whether a saved category index can be reused without a rescan.
+"""
+
+import os
+import time
+
+import pytest
+
+from app.utils import file_utils
+from app.utils.file_utils import (
+    FileMetadataTable, DIR_MTIME_MAX_AGE_FACTOR,
+    get_directory_mtime, is_index_fresh
+)
+
+CACHE_EXPIRY = 300
+
+@pytest.fixture
+def category(tmp_path):
+    """Category directory whose mtime is safely older than the timestamp granularity."""
+    (tmp_path / "a.jpg").write_bytes(b"x")
+    past = time.time() - 60
+    os.utime(tmp_path, (past, past))
+    return str(tmp_path)
+
+def _index(category, age, now):
+    return {'timestamp': now - age, 'dir_mtime': get_directory_mtime(category), 'files': FileMetadataTable()}
+
+def test_young_index_is_fresh_without_checking_the_directory(category, monkeypatch):
+    now = time.time()
+    index_data = _index(category, 10, now)
+    monkeypatch.setattr(file_utils, 'get_directory_mtime', lambda path: pytest.fail("directory was stat()ed"))
+    
+    assert is_index_fresh(index_data, category, CACHE_EXPIRY, now)
+
+def test_matching_mtime_keeps_an_expired_index_only_up_to_the_bound(category):
+    now = time.time()
+    bound = CACHE_EXPIRY * DIR_MTIME_MAX_AGE_FACTOR
+    
+    assert is_index_fresh(_index(category, CACHE_EXPIRY + 1, now), category, CACHE_EXPIRY, now)
+    assert is_index_fresh(_index(category, bound, now), category, CACHE_EXPIRY, now)
+    assert not is_index_fresh(_index(category, bound + 1, now), category, CACHE_EXPIRY, now)
+
+def test_directory_change_invalidates_an_expired_index(category):
+    now = time.time()
+    index_data = _index(category, CACHE_EXPIRY + 1, now)
+    
+    os.remove(os.path.join(category, "a.jpg"))
+    past = time.time() - 30
+    os.utime(category, (past, past))
+    
+    assert not is_index_fresh(index_data, category, CACHE_EXPIRY, now)
+
+def test_recent_directory_mtime_cannot_vouch_for_an_index(category):
+    os.utime(category)
+    assert get_directory_mtime(category) is None
+    
+    now = time.time()
+    index_data = {'timestamp': now - CACHE_EXPIRY - 1, 'dir_mtime': None, 'files': FileMetadataTable()}
+    assert not is_index_fresh(index_data, category, CACHE_EXPIRY, now)
+
+def test_directory_mtime_check_creates_nothing(category):
+    get_directory_mtime(category)
+    
+    assert not os.path.exists(os.path.join(category, file_utils.GHOSTHUB_DIR_NAME))
+
+def test_missing_fields_are_never_fresh(category):
+    assert not is_index_fresh(None, category, CACHE_EXPIRY)
+    assert not is_index_fresh({'timestamp': time.time()}, category, CACHE_EXPIRY)
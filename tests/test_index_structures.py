@@ -0,0 +1,77 @@
+"""
+Tests for the category index data structures: the FileMetadataTable column
+layout.
+"""
+
+import json
+
+from app.utils.file_utils import FileMetadataTable, get_index_filepath, load_index, save_index
+
+FILES = [
+    {'name': 'b.mp4', 'size': 2048, 'mtime': 1700000000.5},
+    {'name': 'a.jpg', 'size': 10, 'mtime': 1600000000.25},
+    {'name': 'c.png', 'size': 0, 'mtime': 0.0},
+]
+
+def test_table_round_trips_through_column_layout():
+    table = FileMetadataTable.from_json(FILES)
+    
+    loaded = FileMetadataTable.from_json(json.loads(json.dumps(table.to_json())))
+    
+    assert list(loaded) == FILES
+    assert loaded.to_json() == {
+        'names': ['b.mp4', 'a.jpg', 'c.png'],
+        'sizes': [2048, 10, 0],
+        'mtimes': [1700000000.5, 1600000000.25, 0.0],
+    }
+
+def test_legacy_list_of_dicts_matches_column_layout():
+    legacy = FileMetadataTable.from_json(FILES)
+    columns = FileMetadataTable.from_json(legacy.to_json())
+    
+    assert list(legacy) == list(columns)
+    assert legacy[1] == FILES[1]
+    assert list(legacy[1:]) == FILES[1:]
+
+def test_legacy_entries_default_missing_size_and_mtime():
+    table = FileMetadataTable.from_json([{'name': 'x.gif'}])
+    
+    assert list(table) == [{'name': 'x.gif', 'size': 0, 'mtime': 0}]
+
+def test_with_capacity_then_truncate_keeps_only_filled_rows():
+    table = FileMetadataTable.with_capacity(5)
+    for position, file_meta in enumerate(FILES):
+        table.set(position, file_meta['name'], file_meta['size'], file_meta['mtime'])
+    
+    table.truncate(len(FILES))
+    table.sort_by_name()
+    
+    assert len(table) == 3
+    assert None not in table.names
+    assert [f['name'] for f in table] == ['a.jpg', 'b.mp4', 'c.png']
+    assert table.row_lookup() == {'a.jpg': 0, 'b.mp4': 1, 'c.png': 2}
+
+def test_with_capacity_set_appends_past_the_end():
+    table = FileMetadataTable.with_capacity(1)
+    for position, file_meta in enumerate(FILES):
+        table.set(position, file_meta['name'], file_meta['size'], file_meta['mtime'])
+    
+    assert list(table) == FILES
+
+def test_index_file_round_trips_and_reads_legacy_layout(tmp_path):
+    category = str(tmp_path)
+    files = FileMetadataTable.from_json(FILES)
+    files.sort_by_name()
+    assert save_index(category, {'timestamp': 1.0, 'files': files})
+    
+    with open(get_index_filepath(category), 'rb') as f:
+        assert isinstance(json.loads(f.read())['files'], dict)
+    loaded = load_index(category)
+    assert isinstance(loaded['files'], FileMetadataTable)
+    assert list(loaded['files']) == sorted(FILES, key=lambda f: f['name'])
+    
+    # Indexes written before the column layout are still readable
+    with open(get_index_filepath(category), 'w') as f:
+        json.dump({'timestamp': 2.0, 'files': FILES}, f)
+    legacy = load_index(category)
+    assert list(legacy['files']) == sorted(FILES, key=lambda f: f['name'])
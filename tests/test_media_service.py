@@ -0,0 +1,170 @@
+"""
+Tests for MediaService session tracking, shuffling and media path validation.
+"""
+
+import os
+
+import pytest
+
+from app.services import media_service
+from app.services.media_service import MediaService, LazyShuffle
+from app.services.sync_service import SyncService
+from app.utils.file_utils import FileMetadataTable
+
+@pytest.fixture
+def sessions(monkeypatch):
+    """Empty session tracker limited to three sessions, with sync mode off."""
+    monkeypatch.setattr(media_service, 'MAX_TRACKED_SESSIONS', 3)
+    monkeypatch.setattr(SyncService, 'is_sync_enabled', staticmethod(lambda: False))
+    media_service.seen_files_tracker.clear()
+    yield media_service.seen_files_tracker
+    media_service.seen_files_tracker.clear()
+
+def _files(count):
+    table = FileMetadataTable()
+    for i in range(count):
+        table.append(f"{i:03d}.jpg", 1, 0.0)
+    return table
+
+def _order_for(session_id, files, category_id='cat'):
+    return MediaService._determine_file_order(files, category_id, session_id, True, False, 'Category')
+
+def test_least_recently_used_session_is_evicted(sessions, monkeypatch):
+    files = _files(20)
+    clock = [1000.0]
+    monkeypatch.setattr(media_service.time, 'time', lambda: clock[0])
+    
+    for session_id in ('a', 'b', 'c'):
+        _order_for(session_id, files)
+        clock[0] += 10
+    # Touching 'a' makes 'b' the least recently used session
+    _order_for('a', files)
+    _order_for('d', files)
+    
+    assert list(sessions) == [('cat', 'c'), ('cat', 'a'), ('cat', 'd')]
+
+def test_sessions_are_tracked_per_category(sessions):
+    files = _files(20)
+    _order_for('a', files, category_id='one')
+    _order_for('a', files, category_id='two')
+    
+    assert sessions[('one', 'a')] is not sessions[('two', 'a')]
+
+def test_expired_sessions_are_dropped_oldest_first(sessions):
+    files = _files(20)
+    for session_id in ('a', 'b', 'c'):
+        _order_for(session_id, files)
+    sessions[('cat', 'a')].last_access = 10
+    sessions[('cat', 'b')].last_access = 20
+    
+    removed = MediaService._evict_sessions(current_time=100, session_expiry=50)
+    
+    assert removed == 2
+    assert list(sessions) == [('cat', 'c')]
+
+def test_evicted_session_state_is_never_reused(sessions):
+    files = _files(20)
+    _order_for('a', files)
+    evicted = sessions[('cat', 'a')]
+    evicted_order = evicted.order
+
+    for session_id in ('b', 'c', 'd', 'e'):
+        _order_for(session_id, files)
+
+    states = list(sessions.values())
+    assert len(states) == 3
+    assert all(state is not evicted for state in states)
+    assert len({id(state) for state in states}) == 3
+    # A request still holding the evicted state keeps its own order
+    assert evicted.order is evicted_order
+
+def test_lazy_shuffle_pages_form_a_permutation():
+    names = [f"{i:04d}.jpg" for i in range(1000)]
+    shuffle = LazyShuffle(names)
+    
+    pages = []
+    for start in range(0, len(names), 37):
+        pages.extend(shuffle[start:start + 37])
+    
+    assert len(pages) == len(names)
+    assert sorted(pages) == names
+    assert pages == list(shuffle)
+    assert shuffle[-1] == pages[-1]
+
+def test_lazy_shuffle_out_of_order_reads_stay_consistent():
+    names = [str(i) for i in range(200)]
+    shuffle = LazyShuffle(names)
+    
+    tail = shuffle[150:200]
+    head = shuffle[0:150]
+    
+    assert shuffle[150:200] == tail
+    assert sorted(head + tail, key=int) == names
+    with pytest.raises(IndexError):
+        shuffle[200]
+
+def test_lazy_shuffle_slices_fix_only_the_positions_read():
+    names = [str(i) for i in range(100)]
+    
+    forward = LazyShuffle(names)
+    page = forward[10:20]
+    assert len(forward._shuffled) == 20
+    
+    backward = LazyShuffle(names)
+    reversed_page = backward[30:20:-1]
+    assert len(backward._shuffled) == 31
+    assert reversed_page == list(backward)[30:20:-1]
+    
+    assert page == list(forward)[10:20]
+
+def test_lazy_shuffle_negative_step_covers_whole_list():
+    names = [str(i) for i in range(50)]
+    shuffle = LazyShuffle(names)
+    
+    assert shuffle[::-1] == list(shuffle)[::-1]
+    assert sorted(shuffle[::-2] + shuffle[-2::-2], key=int) == names
+
+@pytest.fixture
+def media_root(tmp_path, monkeypatch):
+    """A category at media/foo next to a sibling media/foobar that shares its prefix."""
+    foo = tmp_path / "media" / "foo"
+    foobar = tmp_path / "media" / "foobar"
+    (foo / "sub").mkdir(parents=True)
+    foobar.mkdir()
+    (foo / "a.jpg").write_bytes(b"x")
+    (foo / "sub" / "b.jpg").write_bytes(b"x")
+    (foo / "dir.jpg").mkdir()
+    (foobar / "secret.jpg").write_bytes(b"x")
+    (foo / "inside.jpg").symlink_to(foo / "a.jpg")
+    (foo / "outside.jpg").symlink_to(foobar / "secret.jpg")
+    (foo / "sibling").symlink_to(foobar)
+    
+    category = {'id': 'foo', 'name': 'Foo', 'path': str(foo)}
+    monkeypatch.setattr(media_service, '_cached_category', lambda category_id: category)
+    return foo
+
+@pytest.mark.parametrize('filename, expected', [
+    ('a.jpg', 'a.jpg'),
+    ('sub/b.jpg', 'sub/b.jpg'),
+    ('inside.jpg', 'a.jpg'),
+])
+def test_media_filepath_inside_category_is_served(media_root, filename, expected):
+    filepath, error = MediaService.get_media_filepath('foo', filename)
+    
+    assert error is None
+    assert filepath == os.path.join(os.path.realpath(media_root), expected)
+
+@pytest.mark.parametrize('filename, expected_error', [
+    ('../foobar/secret.jpg', "Invalid filename."),
+    ('sub/../../foobar/secret.jpg', "Invalid filename."),
+    ('/etc/passwd', "Invalid filename."),
+    ('outside.jpg', "Access denied."),
+    ('sibling/secret.jpg', "Access denied."),
+    ('missing.jpg', "File not found."),
+    ('dir.jpg', "Path is not a file."),
+])
+def test_media_filepath_outside_category_is_refused(media_root, filename, expected_error):
+    filepath, error = MediaService.get_media_filepath('foo', filename)
+    
+    assert filepath is None
+    assert error == expected_error
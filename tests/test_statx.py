@@ -0,0 +1,47 @@
+"""
+Tests for the statx binding used when stat-ing files during index builds.
+"""
+
+import os
+
+import pytest
+from flask import Flask
+
+from app.utils import statx
+from app.utils.file_utils import scan_directory
+
+@pytest.mark.skipif(not statx.HAS_STATX, reason="statx is not available on this platform")
+def test_fast_stat_matches_os_stat(tmp_path):
+    media = tmp_path / "clip.mp4"
+    media.write_bytes(b"x" * 4097)
+    os.utime(media, (1600000000.123456789, 1700000000.987654321))
+    (tmp_path / "link.mp4").symlink_to(media)
+    
+    dir_fd = os.open(tmp_path, os.O_RDONLY)
+    try:
+        for name in ("clip.mp4", "link.mp4"):
+            result = statx.fast_stat(dir_fd, name)
+            if result is None:
+                pytest.skip("statx is not supported by this kernel")
+            expected = os.stat(tmp_path / name)
+            assert result == (expected.st_mode, expected.st_size, expected.st_mtime)
+        
+        with pytest.raises(FileNotFoundError):
+            statx.fast_stat(dir_fd, "missing.mp4")
+    finally:
+        os.close(dir_fd)
+
+@pytest.mark.parametrize('dont_sync', [False, True])
+def test_scan_directory_stats_agree_with_and_without_statx(tmp_path, dont_sync):
+    for name, size in (("a.jpg", 3), ("b.mp4", 70000)):
+        (tmp_path / name).write_bytes(b"x" * size)
+    (tmp_path / "sub").mkdir()
+    
+    app = Flask(__name__)
+    app.config['STATX_DONT_SYNC'] = dont_sync
+    with app.app_context(), scan_directory(str(tmp_path)) as (entries, stat_entry):
+        stats = {entry.name: stat_entry(entry) for entry in entries}
+    
+    for name, result in stats.items():
+        expected = os.stat(tmp_path / name)
+        assert result == (expected.st_mode, expected.st_size, expected.st_mtime)